@@ -18,6 +18,24 @@ class NanoBananaAgent:
     Hỗ trợ chỉnh sửa ảnh với prompt, tương tự như Qwen Fast Edit
     """
     
+    DEBLUR_PROMPTS = {
+        "light": "Slightly sharpen this image, enhance clarity and details",
+        "medium": "Remove blur and make this image sharp and clear, enhance all details",
+        "strong": "Significantly enhance sharpness, remove all blur, maximize clarity and detail"
+    }
+    
+    BEAUTY_PROMPTS = {
+        "subtle": "Subtly enhance facial features, smooth skin tone naturally, maintain authenticity",
+        "natural": "Enhance facial beauty naturally, smooth skin, brighten eyes, perfect lighting",
+        "strong": "Professional beauty enhancement, flawless skin, perfect features, magazine quality"
+    }
+    
+    UPSCALE_PROMPTS = {
+        "light": "Upscale this image, slightly enhance quality and details",
+        "medium": "Upscale this image, enhance quality, sharpen details, improve colors",
+        "strong": "Upscale this image to highest quality, maximize sharpness and details, perfect colors"
+    }
+    
     def __init__(self, api_token: Optional[str] = None):
         """
         Args:
@@ -108,15 +126,8 @@ class NanoBananaAgent:
                 
                 output_file = output_dir_path / f"nano_banana_output.{output_format}"
                 
-                # Write output to file
-                with open(output_file, "wb") as f:
-                    if hasattr(output, 'read'):
-                        f.write(output.read())
-                    else:
-                        # If it's a URL, download it
-                        import requests
-                        response = requests.get(str(output))
-                        f.write(response.content)
+                # Write output to file (network read, so off the event loop)
+                await loop.run_in_executor(None, self._save_output, output, output_file)
                 
                 output_path = str(output_file)
                 logger.info(f"Saved output to: {output_path}")
@@ -144,6 +155,20 @@ class NanoBananaAgent:
                 "error": str(e)
             }
     
+    @staticmethod
+    def _save_output(output: Any, output_file: Path) -> None:
+        """Write a FileOutput or stream an output URL to disk (blocking)"""
+        with open(output_file, "wb") as f:
+            if hasattr(output, 'read'):
+                f.write(output.read())
+            else:
+                # If it's a URL, stream it to disk
+                import requests
+                with requests.get(str(output), stream=True, timeout=60) as response:
+                    response.raise_for_status()
+                    for chunk in response.iter_content(chunk_size=1 << 20):
+                        f.write(chunk)
+    
     async def edit_batch(
         self,
         image_paths: List[str],
@@ -189,13 +214,7 @@ class NanoBananaAgent:
             strength: "light", "medium", "strong"
             output_dir: Thư mục lưu kết quả
         """
-        prompts = {
-            "light": "Slightly sharpen this image, enhance clarity and details",
-            "medium": "Remove blur and make this image sharp and clear, enhance all details",
-            "strong": "Significantly enhance sharpness, remove all blur, maximize clarity and detail"
-        }
-        
-        prompt = prompts.get(strength, prompts["medium"])
+        prompt = self.DEBLUR_PROMPTS.get(strength, self.DEBLUR_PROMPTS["medium"])
         
         return await self.edit_image(
             image_path, 
@@ -239,13 +258,7 @@ class NanoBananaAgent:
             level: "subtle", "natural", "strong"
             output_dir: Thư mục lưu kết quả
         """
-        prompts = {
-            "subtle": "Subtly enhance facial features, smooth skin tone naturally, maintain authenticity",
-            "natural": "Enhance facial beauty naturally, smooth skin, brighten eyes, perfect lighting",
-            "strong": "Professional beauty enhancement, flawless skin, perfect features, magazine quality"
-        }
-        
-        prompt = prompts.get(level, prompts["natural"])
+        prompt = self.BEAUTY_PROMPTS.get(level, self.BEAUTY_PROMPTS["natural"])
         
         return await self.edit_image(
             image_path, 
@@ -289,13 +302,7 @@ class NanoBananaAgent:
             enhancement_level: "light", "medium", "strong"
             output_dir: Thư mục lưu kết quả
         """
-        prompts = {
-            "light": "Upscale this image, slightly enhance quality and details",
-            "medium": "Upscale this image, enhance quality, sharpen details, improve colors",
-            "strong": "Upscale this image to highest quality, maximize sharpness and details, perfect colors"
-        }
-        
-        prompt = prompts.get(enhancement_level, prompts["medium"])
+        prompt = self.UPSCALE_PROMPTS.get(enhancement_level, self.UPSCALE_PROMPTS["medium"])
         
         return await self.edit_image(
             image_path, 
@@ -1,7 +1,7 @@
 """
 Orchestrator - Coordinates multiple agents in a workflow
 """
-from typing import List, Optional
+from typing import Dict, List
 from loguru import logger
 
 from backend.core.state import WorkflowState, TaskStatus
@@ -147,8 +147,8 @@ class ConditionalOrchestrator:
         return state
 
 
-# Global orchestrator instance
-_orchestrator_instance: Optional[SimpleOrchestrator] = None
+# Global orchestrator instances, one per analyzer mode
+_orchestrator_instances: Dict[bool, SimpleOrchestrator] = {}
 
 
 def get_orchestrator(use_llm_analyzer: bool = True) -> SimpleOrchestrator:
@@ -161,9 +161,10 @@ def get_orchestrator(use_llm_analyzer: bool = True) -> SimpleOrchestrator:
     Returns:
         Orchestrator instance
     """
-    global _orchestrator_instance
+    orchestrator = _orchestrator_instances.get(use_llm_analyzer)
     
-    if _orchestrator_instance is None:
-        _orchestrator_instance = SimpleOrchestrator(use_llm_analyzer=use_llm_analyzer)
+    if orchestrator is None:
+        orchestrator = SimpleOrchestrator(use_llm_analyzer=use_llm_analyzer)
+        _orchestrator_instances[use_llm_analyzer] = orchestrator
     
-    return _orchestrator_instance
+    return orchestrator
@@ -1,8 +1,9 @@
 """
 Quality Control Agent - Validates output quality and completeness
 """
+import filecmp
 from pathlib import Path
-from typing import Dict, Any
+from typing import Dict, Any, Tuple
 from loguru import logger
 from PIL import Image
 
@@ -105,18 +106,29 @@ class QualityControlAgent(BaseAgent):
         # Check 2: File size
         checks["file_size"] = self._check_file_size(output_path)
         
-        # Check 3: Valid image format
-        checks["image_format"] = self._check_image_format(output_path)
+        # Check 3: Valid image format (checks 3-5 share this one header parse)
+        try:
+            output_img = Image.open(output_path)
+        except Exception as e:
+            checks["image_format"] = {
+                "passed": False,
+                "message": f"Invalid image: {e}",
+                "details": {"error": str(e)}
+            }
+            return checks
         
-        if checks["image_format"]["passed"]:
+        with output_img:
+            checks["image_format"] = self._check_image_format(output_img)
+            
             # Check 4: Image dimensions
-            checks["dimensions"] = self._check_dimensions(output_path)
+            checks["dimensions"] = self._check_dimensions(output_img)
             
             # Check 5: Compare with input (if applicable)
             if state.input_path:
                 checks["comparison"] = self._check_comparison(
                     Path(state.input_path),
-                    output_path
+                    output_path,
+                    output_img.size
                 )
         
         return checks
@@ -161,74 +173,63 @@ class QualityControlAgent(BaseAgent):
                 "details": {"error": str(e)}
             }
     
-    def _check_image_format(self, output_path: Path) -> Dict[str, Any]:
+    def _check_image_format(self, img: Image.Image) -> Dict[str, Any]:
         """Check if file is a valid image"""
-        try:
-            with Image.open(output_path) as img:
-                return {
-                    "passed": True,
-                    "message": f"Valid {img.format} image",
-                    "details": {
-                        "format": img.format,
-                        "mode": img.mode,
-                        "size": img.size
-                    }
-                }
-        except Exception as e:
-            return {
-                "passed": False,
-                "message": f"Invalid image: {e}",
-                "details": {"error": str(e)}
+        return {
+            "passed": True,
+            "message": f"Valid {img.format} image",
+            "details": {
+                "format": img.format,
+                "mode": img.mode,
+                "size": img.size
             }
+        }
     
-    def _check_dimensions(self, output_path: Path) -> Dict[str, Any]:
+    def _check_dimensions(self, img: Image.Image) -> Dict[str, Any]:
         """Check if image dimensions are valid"""
-        try:
-            with Image.open(output_path) as img:
-                width, height = img.size
-                passed = width >= self.min_dimension and height >= self.min_dimension
-                
-                return {
-                    "passed": passed,
-                    "message": f"Image size: {width}x{height}",
-                    "details": {
-                        "width": width,
-                        "height": height,
-                        "min_dimension": self.min_dimension
-                    }
-                }
-        except Exception as e:
-            return {
-                "passed": False,
-                "message": f"Failed to check dimensions: {e}",
-                "details": {"error": str(e)}
+        width, height = img.size
+        passed = width >= self.min_dimension and height >= self.min_dimension
+        
+        return {
+            "passed": passed,
+            "message": f"Image size: {width}x{height}",
+            "details": {
+                "width": width,
+                "height": height,
+                "min_dimension": self.min_dimension
             }
+        }
     
-    def _check_comparison(self, input_path: Path, output_path: Path) -> Dict[str, Any]:
+    def _check_comparison(
+        self,
+        input_path: Path,
+        output_path: Path,
+        output_size: Tuple[int, int]
+    ) -> Dict[str, Any]:
         """Compare input and output images"""
         try:
             with Image.open(input_path) as input_img:
-                with Image.open(output_path) as output_img:
-                    # Check if dimensions match
-                    same_size = input_img.size == output_img.size
-                    
-                    # Check if output is not identical to input (was actually processed)
-                    input_bytes = input_path.read_bytes()
-                    output_bytes = output_path.read_bytes()
-                    is_different = input_bytes != output_bytes
-                    
-                    passed = same_size and is_different
-                    
-                    return {
-                        "passed": passed,
-                        "message": "Output was processed successfully",
-                        "details": {
-                            "input_size": input_img.size,
-                            "output_size": output_img.size,
-                            "size_match": same_size,
-                            "was_processed": is_different
-                        }
-                    }
+                input_size = input_img.size
+            
+            # Check if dimensions match
+            same_size = input_size == output_size
+            
+            # Check if output is not identical to input (was actually processed);
+            # filecmp stops at a size mismatch or the first differing block
+            is_different = not filecmp.cmp(input_path, output_path, shallow=False)
+            
+            passed = same_size and is_different
+            
+            return {
+                "passed": passed,
+                "message": "Output was processed successfully",
+                "details": {
+                    "input_size": input_size,
+                    "output_size": output_size,
+                    "size_match": same_size,
+                    "was_processed": is_different
+                }
+            }
         except Exception as e:
             return {
                 "passed": True,  # Don't fail on comparison error
@@ -13,6 +13,18 @@ class QwenEditAgent:
     Agent sử dụng Qwen-Image-Edit-2509 cho image enhancement tasks
     """
     
+    DEBLUR_PROMPTS = {
+        "light": "Slightly sharpen this image, enhance clarity and details",
+        "medium": "Remove blur and make this image sharp and clear, enhance all details",
+        "strong": "Significantly enhance sharpness, remove all blur, maximize clarity and detail"
+    }
+    
+    BEAUTY_PROMPTS = {
+        "subtle": "Subtly enhance facial features, smooth skin tone naturally, maintain authenticity",
+        "natural": "Enhance facial beauty naturally, smooth skin, brighten eyes, perfect lighting",
+        "strong": "Professional beauty enhancement, flawless skin, perfect features, magazine quality"
+    }
+    
     def __init__(self, use_fast: bool = False):
         """
         Args:
@@ -163,13 +175,7 @@ class QwenEditAgent:
             image_path: Đường dẫn ảnh hoặc list đường dẫn
             strength: "light", "medium", "strong"
         """
-        prompts = {
-            "light": "Slightly sharpen this image, enhance clarity and details",
-            "medium": "Remove blur and make this image sharp and clear, enhance all details",
-            "strong": "Significantly enhance sharpness, remove all blur, maximize clarity and detail"
-        }
-        
-        prompt = prompts.get(strength, prompts["medium"])
+        prompt = self.DEBLUR_PROMPTS.get(strength, self.DEBLUR_PROMPTS["medium"])
         return await self.edit_image(image_path, prompt)
     
     async def remove_object(
@@ -199,13 +205,7 @@ class QwenEditAgent:
             image_path: Đường dẫn ảnh hoặc list đường dẫn
             level: "subtle", "natural", "strong"
         """
-        prompts = {
-            "subtle": "Subtly enhance facial features, smooth skin tone naturally, maintain authenticity",
-            "natural": "Enhance facial beauty naturally, smooth skin, brighten eyes, perfect lighting",
-            "strong": "Professional beauty enhancement, flawless skin, perfect features, magazine quality"
-        }
-        
-        prompt = prompts.get(level, prompts["natural"])
+        prompt = self.BEAUTY_PROMPTS.get(level, self.BEAUTY_PROMPTS["natural"])
         return await self.edit_image(image_path, prompt)
     
     async def style_transfer(
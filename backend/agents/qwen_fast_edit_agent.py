@@ -125,12 +125,12 @@ class QwenFastEditAgent:
         if len(image_paths) != len(prompts):
             raise ValueError("Number of images must match number of prompts")
         
-        results = []
-        for image_path, prompt in zip(image_paths, prompts):
-            result = await self.edit_image(image_path, prompt, **kwargs)
-            results.append(result)
+        results = await asyncio.gather(*[
+            self.edit_image(image_path, prompt, **kwargs)
+            for image_path, prompt in zip(image_paths, prompts)
+        ])
         
-        return results
+        return list(results)
     
     async def quick_color_change(
         self,
@@ -2,7 +2,7 @@
 Task Analyzer Agent - Analyzes user requests to determine task type and parameters
 """
 import json
-from typing import Dict, Any
+from typing import Dict, Any, List
 from loguru import logger
 from openai import AsyncOpenAI
 
@@ -19,6 +19,13 @@ class TaskAnalyzerAgent(LLMAgent):
     - Additional parameters needed
     """
     
+    TASK_TYPE_MAPPING = {
+        "deblur": TaskType.DEBLUR,
+        "inpaint": TaskType.INPAINT,
+        "beauty_enhance": TaskType.BEAUTY_ENHANCE,
+        "generate": TaskType.GENERATE
+    }
+    
     def __init__(self):
         super().__init__(
             name="Task Analyzer",
@@ -105,14 +112,7 @@ Chỉ trả về JSON, không thêm text khác."""
             task_type_str = analysis.get("task_type", "deblur")
             
             # Map string to TaskType enum
-            task_type_mapping = {
-                "deblur": TaskType.DEBLUR,
-                "inpaint": TaskType.INPAINT,
-                "beauty_enhance": TaskType.BEAUTY_ENHANCE,
-                "generate": TaskType.GENERATE
-            }
-            
-            state.task_type = task_type_mapping.get(task_type_str, TaskType.DEBLUR)
+            state.task_type = self.TASK_TYPE_MAPPING.get(task_type_str, TaskType.DEBLUR)
             state.progress = 20
             
             # Store analysis results
@@ -179,6 +179,22 @@ class SimpleTaskAnalyzer:
         Returns:
             Analysis results
         """
+        return self.classify(user_request)
+    
+    async def analyze_batch(self, user_requests: List[str]) -> List[Dict[str, Any]]:
+        """
+        Analyze many requests in one call (results in input order)
+        
+        Args:
+            user_requests: User request strings
+            
+        Returns:
+            List of analysis results
+        """
+        return [self.classify(request) for request in user_requests]
+    
+    def classify(self, user_request: str) -> Dict[str, Any]:
+        """Keyword scoring shared by analyze and analyze_batch (pure CPU, no awaits)"""
         user_request_lower = user_request.lower()
         scores = {}
         
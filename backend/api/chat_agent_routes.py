@@ -9,10 +9,10 @@ from typing import List, Optional
 from pydantic import BaseModel, Field
 from datetime import datetime
 from loguru import logger
+import re
 import uuid
 import aiofiles
 import shutil
-import httpx
 from pathlib import Path
 
 from backend.database.database import get_db
@@ -23,7 +23,7 @@ from backend.core.utils import generate_task_id, sanitize_filename
 from backend.core.history_helper import save_task_with_chat, update_task_result, get_or_create_session
 from backend.agents.imagen4_agent import imagen4_agent
 from backend.agents.huggingface_generation_agent import generation_agent
-from backend.models.replicate_wrapper import replicate_client
+from backend.models.replicate_wrapper import replicate_client, ENHANCEMENT_TASKS
 from backend.agents.qwen_fast_edit_agent import qwen_fast_edit_agent
 from backend.agents.nano_banana_agent import nano_banana_agent
 
@@ -113,14 +113,37 @@ async def get_current_user(
 
 # ==================== AGENT ORCHESTRATOR ====================
 
+def _keyword_re(*keywords: str) -> "re.Pattern":
+    """Compile keywords into one alternation; matches substrings like the old `in` checks"""
+    return re.compile("|".join(map(re.escape, keywords)))
+
+
 class ChatOrchestrator:
     """
     Intelligent orchestrator that analyzes user messages
     and routes to appropriate agents
     """
     
-    @staticmethod
-    def analyze_intent(message: str) -> dict:
+    # Keyword tables, compiled once: each check is a single regex scan of the message
+    GENERATION_RE = _keyword_re('generate', 'create', 'make', 'draw', 'tạo', 'vẽ', 'sinh')
+    IMAGE_NOUN_RE = _keyword_re('image', 'picture', 'ảnh', 'hình')
+    # Edit keywords and indicators (check first, more specific)
+    EDIT_RE = _keyword_re(
+        'edit', 'change', 'modify', 'adjust', 'transform', 'convert',
+        'chỉnh sửa', 'thay đổi', 'điều chỉnh', 'biến đổi', 'chuyển đổi',
+        'make it', 'turn into', 'change to', 'transform to',
+        'thành', 'sang', 'làm cho'
+    )
+    EDIT_TARGET_RE = _keyword_re('color', 'style', 'background', 'màu', 'nền', 'phong cách')
+    BLUR_RE = _keyword_re('blur', 'blurry', 'sharp', 'focus', 'clarity',
+                          'mờ', 'nét', 'rõ', 'sắc nét', 'làm nét')
+    REMOVE_RE = _keyword_re('remove', 'delete', 'erase', 'clean', 'clear', 'eliminate',
+                            'xóa', 'loại bỏ', 'xoá', 'bỏ', 'gỡ')
+    ENHANCE_RE = _keyword_re('enhance', 'improve', 'fix', 'repair', 'restore', 'beautify', 'quality',
+                             'cải thiện', 'tăng cường', 'sửa', 'nâng cao', 'làm đẹp', 'chất lượng')
+    
+    @classmethod
+    def analyze_intent(cls, message: str) -> dict:
         """
         Analyze user message to determine intent and required agent
         
@@ -129,39 +152,28 @@ class ChatOrchestrator:
         """
         message_lower = message.lower()
         
-        # Image generation keywords
-        generation_keywords = ['generate', 'create', 'make', 'draw', 'tạo', 'vẽ', 'sinh']
-        if any(keyword in message_lower for keyword in generation_keywords):
-            if 'image' in message_lower or 'picture' in message_lower or 'ảnh' in message_lower or 'hình' in message_lower:
-                return {
-                    'intent': 'generate_image',
-                    'agent': 'generation_agent',
-                    'requires_image': False,
-                    'action': 'generate',
-                    'prompt': message
-                }
+        # Image generation
+        if cls.GENERATION_RE.search(message_lower) and cls.IMAGE_NOUN_RE.search(message_lower):
+            return {
+                'intent': 'generate_image',
+                'agent': 'generation_agent',
+                'requires_image': False,
+                'action': 'generate',
+                'prompt': message
+            }
         
-        # Edit keywords (check first, more specific)
-        edit_keywords = ['edit', 'change', 'modify', 'adjust', 'transform', 'convert', 
-                        'chỉnh sửa', 'thay đổi', 'điều chỉnh', 'biến đổi', 'chuyển đổi']
-        edit_indicators = ['make it', 'turn into', 'change to', 'transform to', 
-                          'thành', 'sang', 'làm cho']
-        if (any(keyword in message_lower for keyword in edit_keywords) or 
-            any(indicator in message_lower for indicator in edit_indicators)):
-            # If it mentions specific changes (colors, objects, style), it's editing
-            if any(word in message_lower for word in ['color', 'style', 'background', 'màu', 'nền', 'phong cách']):
-                return {
-                    'intent': 'edit_image',
-                    'agent': 'qwen_edit_agent',
-                    'requires_image': True,
-                    'action': 'edit',
-                    'prompt': message
-                }
+        # Edit: only when it mentions specific changes (colors, objects, style)
+        if cls.EDIT_RE.search(message_lower) and cls.EDIT_TARGET_RE.search(message_lower):
+            return {
+                'intent': 'edit_image',
+                'agent': 'qwen_edit_agent',
+                'requires_image': True,
+                'action': 'edit',
+                'prompt': message
+            }
         
-        # Deblur keywords (more specific)
-        blur_keywords = ['blur', 'blurry', 'sharp', 'focus', 'clarity', 
-                        'mờ', 'nét', 'rõ', 'sắc nét', 'làm nét']
-        if any(keyword in message_lower for keyword in blur_keywords):
+        # Deblur (more specific)
+        if cls.BLUR_RE.search(message_lower):
             return {
                 'intent': 'deblur_image',
                 'agent': 'enhancement_agent',
@@ -169,10 +181,8 @@ class ChatOrchestrator:
                 'action': 'deblur'
             }
         
-        # Inpaint/remove keywords
-        remove_keywords = ['remove', 'delete', 'erase', 'clean', 'clear', 'eliminate',
-                          'xóa', 'loại bỏ', 'xoá', 'bỏ', 'gỡ']
-        if any(keyword in message_lower for keyword in remove_keywords):
+        # Inpaint/remove
+        if cls.REMOVE_RE.search(message_lower):
             return {
                 'intent': 'remove_object',
                 'agent': 'enhancement_agent',
@@ -180,10 +190,8 @@ class ChatOrchestrator:
                 'action': 'inpaint'
             }
         
-        # General enhancement keywords (less specific, check last)
-        enhancement_keywords = ['enhance', 'improve', 'fix', 'repair', 'restore', 'beautify', 'quality',
-                               'cải thiện', 'tăng cường', 'sửa', 'nâng cao', 'làm đẹp', 'chất lượng']
-        if any(keyword in message_lower for keyword in enhancement_keywords):
+        # General enhancement (less specific, check last)
+        if cls.ENHANCE_RE.search(message_lower):
             return {
                 'intent': 'enhance_image',
                 'agent': 'enhancement_agent',
@@ -246,6 +254,7 @@ Hãy cho tôi biết bạn muốn làm gì! Đừng quên tải ảnh lên bằn
 # In-memory task storage (similar to main.py)
 chat_tasks_db = {}
 
+
 async def process_enhancement_task(
     task_id: str,
     task_type: str,
@@ -276,17 +285,11 @@ async def process_enhancement_task(
         # Process based on task type
         output_path = None
         
-        if task_type == "deblur":
-            logger.info(f"Deblurring image for task {task_id}")
-            output_path = await replicate_client.deblur_image(input_path)
-            
-        elif task_type == "inpaint":
-            logger.info(f"Inpainting image for task {task_id}")
-            output_path = await replicate_client.inpaint_image(input_path)
-            
-        elif task_type == "enhance":
-            logger.info(f"Enhancing image for task {task_id}")
-            output_path = await replicate_client.enhance_beauty(input_path)
+        # "edit" goes to the Nano Banana agent instead
+        if task_type in ENHANCEMENT_TASKS:
+            method = ENHANCEMENT_TASKS[task_type]
+            logger.info(f"Running {method.__name__} for task {task_id}")
+            output_path = await method(image_path=input_path)
             
         elif task_type == "edit":
             logger.info(f"Editing image with Qwen for task {task_id}")
@@ -332,7 +335,8 @@ async def process_enhancement_task(
             task_id=task_id,
             session_id=session_id,
             status="completed",
-            result_path=result_url
+            result_path=result_url,
+            commit=False
         )
         
         chat_tasks_db[task_id] = {
@@ -416,12 +420,7 @@ async def process_generation_task(
                 output_filename = f"generated_{task_id}.png"
                 final_output_path = settings.OUTPUT_DIR / output_filename
                 
-                async with httpx.AsyncClient() as client:
-                    response = await client.get(generated_path)
-                    response.raise_for_status()
-                    
-                    with open(final_output_path, 'wb') as f:
-                        f.write(response.content)
+                await replicate_client.download(generated_path, final_output_path)
                 
                 result_url = f"/outputs/{output_filename}"
             else:
@@ -434,7 +433,8 @@ async def process_generation_task(
                 task_id=task_id,
                 session_id=session_id,
                 status="completed",
-                result_path=result_url
+                result_path=result_url,
+                commit=False
             )
             
             chat_tasks_db[task_id] = {
@@ -531,17 +531,19 @@ async def send_message(
                 user_id=current_user.id,
                 session_id=session_id,
                 title=title,
-                task_type="chat"
+                task_type="chat",
+                commit=False
             )
         
-        # Save user message
+        # Save user message (committed together with the assistant reply below)
         crud.create_chat_message(
             db=db,
             user_id=current_user.id,
             session_id=session_id,
             role="user",
             message=message,
-            extra_data={"has_image": image is not None}
+            extra_data={"has_image": image is not None},
+            commit=False
         )
         
         # Analyze intent
@@ -601,7 +603,8 @@ async def send_message(
                     'intent': intent_data['intent'],
                     'image_path': image_path
                 },
-                session_id=session_id
+                session_id=session_id,
+                commit=False
             )
             
             # Save assistant response
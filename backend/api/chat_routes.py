@@ -115,6 +115,16 @@ async def create_message(
                 detail="Role must be 'user' or 'assistant'"
             )
         
+        # Register the session so it shows up in get_user_sessions;
+        # committed together with the message below
+        crud.create_or_update_chat_session(
+            db=db,
+            user_id=current_user.id,
+            session_id=message_data.session_id,
+            title=message_data.message[:100] if message_data.role == "user" else None,
+            commit=False
+        )
+        
         # Create message
         chat_message = crud.create_chat_message(
             db=db,
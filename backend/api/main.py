@@ -11,7 +11,7 @@ sys.path.insert(0, str(project_root))
 
 from contextlib import asynccontextmanager
 from fastapi import FastAPI, UploadFile, File, HTTPException, Form, BackgroundTasks, Depends, Request
-from fastapi.responses import FileResponse, JSONResponse
+from fastapi.responses import FileResponse, JSONResponse, StreamingResponse
 from fastapi.middleware.cors import CORSMiddleware
 from fastapi.staticfiles import StaticFiles
 from fastapi.security import HTTPBearer, HTTPAuthorizationCredentials
@@ -31,9 +31,10 @@ from backend.core.state import (
 from backend.core.utils import (
     generate_task_id,
     sanitize_filename,
-    ImageValidator
+    ImageValidator,
+    TTLCache
 )
-from backend.models.replicate_wrapper import replicate_client
+from backend.models.replicate_wrapper import replicate_client, ENHANCEMENT_TASKS
 from backend.agents.huggingface_generation_agent import generation_agent
 from backend.agents.nano_banana_agent import nano_banana_agent
 from backend.agents.imagen4_agent import imagen4_agent
@@ -71,6 +72,11 @@ logger.add(
 # In-memory task storage (TODO: replace with Redis/Database)
 tasks_db: dict = {}
 
+# How often buffered last_login / last_used stamps are written to the database
+TIMESTAMP_FLUSH_INTERVAL = 30  # seconds
+
+# How often the SSE stream re-checks a task for changes
+TASK_EVENT_INTERVAL = 0.5  # seconds
 
 # ==================== HELPER FUNCTIONS ====================
 
@@ -144,6 +150,29 @@ def save_task_to_history(
         logger.error(f"Failed to save task: {e}")
 
 
+def flush_auth_timestamps():
+    """Persist buffered last_login / last_used stamps"""
+    from backend.database.database import SessionLocal
+    
+    db = SessionLocal()
+    try:
+        flushed = crud.flush_pending_timestamps(db)
+        if flushed:
+            logger.debug(f"Flushed {flushed} auth timestamps")
+    except Exception as e:
+        db.rollback()
+        logger.error(f"Failed to flush auth timestamps: {e}")
+    finally:
+        db.close()
+
+
+async def auth_timestamp_flusher():
+    """Background loop flushing auth timestamps every TIMESTAMP_FLUSH_INTERVAL seconds"""
+    while True:
+        await asyncio.sleep(TIMESTAMP_FLUSH_INTERVAL)
+        await asyncio.to_thread(flush_auth_timestamps)
+
+
 async def process_enhancement_task(task_id: str):
     """
     Background task to process image enhancement using Replicate API
@@ -171,22 +200,13 @@ async def process_enhancement_task(task_id: str):
         task_type = task.get("task_type", "deblur")
         output_path = None
         
-        if task_type == "deblur":
-            logger.info(f"Calling deblur model for task {task_id}")
-            output_path = await replicate_client.deblur_image(input_path)
-            
-        elif task_type == "inpaint":
-            logger.info(f"Calling inpaint model for task {task_id}")
-            # For inpainting, we use LaMa which can auto-detect objects
-            output_path = await replicate_client.inpaint_image(input_path)
-            
-        elif task_type == "beauty_enhance":
-            logger.info(f"Calling beauty enhancement model for task {task_id}")
-            output_path = await replicate_client.enhance_beauty(input_path)
-            
-        else:
+        method = ENHANCEMENT_TASKS.get(task_type)
+        if method is None:
             logger.warning(f"Unknown task type '{task_type}', using deblur")
-            output_path = await replicate_client.deblur_image(input_path)
+            method = ENHANCEMENT_TASKS["deblur"]
+        
+        logger.info(f"Calling {method.__name__} for task {task_id}")
+        output_path = await method(image_path=input_path)
         
         tasks_db[task_id]["progress"] = 90
         
@@ -328,17 +348,11 @@ async def process_generation_task(task_id: str, user_id: Optional[int] = None):
             if is_url:
                 # Download from URL
                 logger.info(f"Downloading image from URL: {generated_path}")
-                import httpx
                 
                 output_filename = f"generated_{task_id}.png"
                 final_output_path = settings.OUTPUT_DIR / output_filename
                 
-                async with httpx.AsyncClient() as client:
-                    response = await client.get(generated_path)
-                    response.raise_for_status()
-                    
-                    with open(final_output_path, 'wb') as f:
-                        f.write(response.content)
+                await replicate_client.download(generated_path, final_output_path)
                 
                 logger.success(f"Downloaded image to: {final_output_path}")
                 
@@ -450,6 +464,8 @@ async def lifespan(app: FastAPI):
     except Exception as e:
         logger.error(f"Failed to initialize database: {e}")
     
+    flusher = asyncio.create_task(auth_timestamp_flusher())
+    
     # TODO: Initialize agents and models
     logger.info("Application startup complete")
     
@@ -457,6 +473,9 @@ async def lifespan(app: FastAPI):
     
     # Shutdown
     logger.info("Shutting down application...")
+    flusher.cancel()
+    flush_auth_timestamps()
+    await replicate_client.aclose()
     # TODO: Cleanup loaded models, close connections
 
 
@@ -500,9 +519,17 @@ async def root():
     }
 
 
-@app.get("/api/v1/health")
-async def health_check():
-    """Health check endpoint"""
+# GPU probe results are reused for a few seconds; task counts stay live
+HEALTH_GPU_TTL = 10  # seconds
+_gpu_probe_cache = TTLCache(maxsize=1, ttl=HEALTH_GPU_TTL)
+
+
+def probe_gpu() -> tuple:
+    """Return (gpu_available, gpu_info), cached for HEALTH_GPU_TTL seconds"""
+    cached = _gpu_probe_cache.get("gpu")
+    if cached is not None:
+        return cached
+    
     gpu_available = False
     gpu_info = None
     
@@ -523,6 +550,15 @@ async def health_check():
     except Exception as e:
         logger.error(f"Error checking GPU: {e}")
     
+    _gpu_probe_cache.set("gpu", (gpu_available, gpu_info))
+    return gpu_available, gpu_info
+
+
+@app.get("/api/v1/health")
+async def health_check():
+    """Health check endpoint"""
+    gpu_available, gpu_info = probe_gpu()
+    
     return {
         "status": "healthy",
         "version": settings.APP_VERSION,
@@ -570,9 +606,12 @@ async def enhance_image(
     filename = sanitize_filename(file.filename or "upload.png")
     file_path = settings.UPLOAD_DIR / f"{task_id}_{filename}"
     
+    content = await file.read()
+    if not ImageValidator.validate_magic(content[:ImageValidator.MAGIC_HEADER_SIZE]):
+        raise HTTPException(status_code=400, detail="File content is not a supported image")
+    
     try:
         async with aiofiles.open(file_path, 'wb') as f:
-            content = await file.read()
             await f.write(content)
         
         logger.info(f"Saved file to {file_path}")
@@ -676,12 +715,8 @@ async def generate_image(
     )
 
 
-@app.get("/api/v1/status/{task_id}", response_model=TaskStatusResponse)
-async def get_task_status(task_id: str):
-    """Get status of a task"""
-    if task_id not in tasks_db:
-        raise HTTPException(status_code=404, detail="Task not found")
-    
+def build_task_status(task_id: str) -> TaskStatusResponse:
+    """Snapshot a tasks_db entry as a TaskStatusResponse"""
     task = tasks_db[task_id]
     
     result_url = None
@@ -689,9 +724,8 @@ async def get_task_status(task_id: str):
         # Generate URL for result
         result_path = Path(task["result_path"])
         result_url = f"/static/{result_path.name}"
-        logger.info(f"Task {task_id} completed. Result URL: {result_url}, Path: {result_path}")
     
-    response = TaskStatusResponse(
+    return TaskStatusResponse(
         task_id=task_id,
         status=task["status"],
         progress=task.get("progress", 0.0),
@@ -699,11 +733,51 @@ async def get_task_status(task_id: str):
         error=task.get("error"),
         result_url=result_url
     )
+
+
+@app.get("/api/v1/status/{task_id}", response_model=TaskStatusResponse)
+async def get_task_status(task_id: str):
+    """Get status of a task"""
+    if task_id not in tasks_db:
+        raise HTTPException(status_code=404, detail="Task not found")
+    
+    response = build_task_status(task_id)
+    if response.result_url:
+        logger.info(f"Task {task_id} completed. Result URL: {response.result_url}")
     
     logger.debug(f"Returning status for {task_id}: {response}")
     return response
 
 
+@app.get("/api/v1/events/{task_id}")
+async def stream_task_events(task_id: str):
+    """
+    Server-Sent Events stream of task status
+    
+    Emits an event whenever status/progress changes and closes once the task
+    is completed or failed, so clients don't have to poll /status.
+    """
+    if task_id not in tasks_db:
+        raise HTTPException(status_code=404, detail="Task not found")
+    
+    async def events():
+        last = None
+        while task_id in tasks_db:
+            current = build_task_status(task_id)
+            if current != last:
+                yield f"data: {current.model_dump_json()}\n\n"
+                last = current
+            if current.status in ("completed", "failed"):
+                return
+            await asyncio.sleep(TASK_EVENT_INTERVAL)
+    
+    return StreamingResponse(
+        events(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache"}
+    )
+
+
 @app.get("/api/v1/result/{task_id}")
 async def get_task_result(task_id: str):
     """Get result of a completed task"""
@@ -781,7 +855,9 @@ async def fast_edit_image(
     
     # Validate file
     content = await file.read()
-    is_valid, error_msg = ImageValidator.validate_file(file.filename, len(content))
+    is_valid, error_msg = ImageValidator.validate_file(
+        file.filename, len(content), content[:ImageValidator.MAGIC_HEADER_SIZE]
+    )
     if not is_valid:
         raise HTTPException(status_code=400, detail=error_msg)
     
@@ -837,11 +913,15 @@ async def fusion_edit_images(
     content1 = await image_1.read()
     content2 = await image_2.read()
     
-    is_valid1, error_msg1 = ImageValidator.validate_file(image_1.filename, len(content1))
+    is_valid1, error_msg1 = ImageValidator.validate_file(
+        image_1.filename, len(content1), content1[:ImageValidator.MAGIC_HEADER_SIZE]
+    )
     if not is_valid1:
         raise HTTPException(status_code=400, detail=f"Image 1: {error_msg1}")
     
-    is_valid2, error_msg2 = ImageValidator.validate_file(image_2.filename, len(content2))
+    is_valid2, error_msg2 = ImageValidator.validate_file(
+        image_2.filename, len(content2), content2[:ImageValidator.MAGIC_HEADER_SIZE]
+    )
     if not is_valid2:
         raise HTTPException(status_code=400, detail=f"Image 2: {error_msg2}")
     
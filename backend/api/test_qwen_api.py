@@ -1,12 +1,16 @@
 """
 Test script for new Qwen Edit API endpoints
 """
+import json
 import requests
 import time
 from pathlib import Path
 
 BASE_URL = "http://localhost:8000/api/v1"
 
+# One keep-alive connection pool for every call (uploads, ~60 status polls, download)
+session = requests.Session()
+
 
 def test_fast_edit():
     """Test fast single image edit"""
@@ -21,7 +25,7 @@ def test_fast_edit():
             "steps": 8
         }
         
-        response = requests.post(f"{BASE_URL}/edit/fast", files=files, data=data)
+        response = session.post(f"{BASE_URL}/edit/fast", files=files, data=data)
         
     if response.status_code == 200:
         result = response.json()
@@ -29,7 +33,7 @@ def test_fast_edit():
         print(f"✅ Task created: {task_id}")
         
         # Poll for result
-        return poll_task(task_id)
+        return wait_for_task(task_id)
     else:
         print(f"❌ Error: {response.status_code} - {response.text}")
         return None
@@ -53,14 +57,14 @@ def test_fusion_edit():
             "steps": 4
         }
         
-        response = requests.post(f"{BASE_URL}/edit/fusion", files=files, data=data)
+        response = session.post(f"{BASE_URL}/edit/fusion", files=files, data=data)
     
     if response.status_code == 200:
         result = response.json()
         task_id = result["task_id"]
         print(f"✅ Task created: {task_id}")
         
-        return poll_task(task_id)
+        return wait_for_task(task_id)
     else:
         print(f"❌ Error: {response.status_code} - {response.text}")
         return None
@@ -70,7 +74,7 @@ def test_list_lora_styles():
     """List available LoRA styles"""
     print("\n=== Available LoRA Styles ===")
     
-    response = requests.get(f"{BASE_URL}/edit/lora-styles")
+    response = session.get(f"{BASE_URL}/edit/lora-styles")
     
     if response.status_code == 200:
         styles = response.json()["styles"]
@@ -80,16 +84,56 @@ def test_list_lora_styles():
         print(f"❌ Error: {response.status_code}")
 
 
-def poll_task(task_id: str, max_attempts: int = 60) -> dict:
-    """Poll task status until completion"""
+def wait_for_task(task_id: str, max_wait: float = 120.0) -> dict:
+    """Follow the task's SSE stream; fall back to polling if the server lacks it"""
+    print(f"Waiting for task {task_id}...")
+    
+    start = time.monotonic()
+    status = None
+    try:
+        with session.get(f"{BASE_URL}/events/{task_id}", stream=True, timeout=(5, max_wait)) as response:
+            if response.status_code in (404, 405):
+                return poll_task(task_id, max_wait)
+            response.raise_for_status()
+            
+            for line in response.iter_lines(decode_unicode=True):
+                if not line or not line.startswith("data:"):
+                    continue
+                status = json.loads(line[5:])
+                print(f"  Status: {status['status']} - Progress: {status['progress']}%")
+    except requests.RequestException as e:
+        print(f"  Event stream unavailable ({e}), polling instead")
+        return poll_task(task_id, max(max_wait - (time.monotonic() - start), 1.0))
+    
+    if not status or status["status"] not in ("completed", "failed"):
+        # Stream ended without a final event (server timeout, task dropped): poll the rest
+        print("  Event stream closed early, polling instead")
+        return poll_task(task_id, max(max_wait - (time.monotonic() - start), 1.0))
+    
+    if status["status"] == "completed":
+        print(f"✅ Task completed!")
+        print(f"   Result URL: {status.get('result_url')}")
+        download_result(task_id)
+    else:
+        print(f"❌ Task failed: {status.get('error')}")
+    return status
+
+
+def poll_task(task_id: str, max_wait: float = 120.0) -> dict:
+    """Poll task status until completion (adaptive interval, honors Retry-After)"""
     print(f"Polling task {task_id}...")
     
-    for i in range(max_attempts):
-        response = requests.get(f"{BASE_URL}/status/{task_id}")
+    start = time.monotonic()
+    delay = 0.25
+    attempt = 0
+    
+    while time.monotonic() - start < max_wait:
+        attempt += 1
+        response = session.get(f"{BASE_URL}/status/{task_id}")
         
         if response.status_code == 200:
             status = response.json()
-            print(f"  [{i+1}/{max_attempts}] Status: {status['status']} - Progress: {status['progress']}%")
+            print(f"  [{attempt}] Status: {status['status']} - Progress: {status['progress']}%")
             
             if status["status"] == "completed":
                 print(f"✅ Task completed!")
@@ -102,8 +146,15 @@ def poll_task(task_id: str, max_attempts: int = 60) -> dict:
             elif status["status"] == "failed":
                 print(f"❌ Task failed: {status.get('error')}")
                 return status
-            
-        time.sleep(2)
+        
+        # Short jobs are picked up within ~0.25s; long ones back off to one poll per 3s
+        retry_after = response.headers.get("Retry-After")
+        try:
+            wait = float(retry_after) if retry_after else delay
+        except ValueError:
+            wait = delay
+        time.sleep(wait)
+        delay = min(delay * 1.5, 3.0)
     
     print("⚠️ Timeout waiting for task")
     return None
@@ -113,15 +164,15 @@ def download_result(task_id: str, output_dir: str = "outputs"):
     """Download result image"""
     Path(output_dir).mkdir(exist_ok=True)
     
-    response = requests.get(f"{BASE_URL}/result/{task_id}")
-    
-    if response.status_code == 200:
-        output_path = Path(output_dir) / f"{task_id}_result.png"
-        with open(output_path, "wb") as f:
-            f.write(response.content)
-        print(f"   Downloaded to: {output_path}")
-    else:
-        print(f"   Failed to download: {response.status_code}")
+    with session.get(f"{BASE_URL}/result/{task_id}", stream=True) as response:
+        if response.status_code == 200:
+            output_path = Path(output_dir) / f"{task_id}_result.png"
+            with open(output_path, "wb") as f:
+                for chunk in response.iter_content(chunk_size=1 << 20):
+                    f.write(chunk)
+            print(f"   Downloaded to: {output_path}")
+        else:
+            print(f"   Failed to download: {response.status_code}")
 
 
 def main():
@@ -130,14 +181,17 @@ def main():
     print("TESTING QWEN EDIT API ENDPOINTS")
     print("=" * 60)
     
-    # Test 1: List LoRA styles
-    test_list_lora_styles()
-    
-    # Test 2: Fast edit (uncomment to run)
-    # test_fast_edit()
-    
-    # Test 3: Fusion edit (uncomment to run)
-    # test_fusion_edit()
+    try:
+        # Test 1: List LoRA styles
+        test_list_lora_styles()
+        
+        # Test 2: Fast edit (uncomment to run)
+        # test_fast_edit()
+        
+        # Test 3: Fusion edit (uncomment to run)
+        # test_fusion_edit()
+    finally:
+        session.close()
     
     print("\n" + "=" * 60)
     print("Tests completed!")
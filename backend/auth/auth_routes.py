@@ -6,6 +6,8 @@ from fastapi.security import HTTPBearer
 from sqlalchemy.orm import Session
 from pydantic import BaseModel, EmailStr
 from typing import Optional
+from functools import partial
+import asyncio
 
 from backend.database.database import get_db
 from backend.database.crud import (
@@ -65,13 +67,18 @@ async def register(user_data: UserRegister, db: Session = Depends(get_db)):
             detail="Email already registered"
         )
     
-    # Create user
-    user = create_user(
-        db,
-        username=user_data.username,
-        email=user_data.email,
-        password=user_data.password,
-        full_name=user_data.full_name
+    # Create user (password hashing is CPU-bound, keep it off the event loop)
+    loop = asyncio.get_event_loop()
+    user = await loop.run_in_executor(
+        None,
+        partial(
+            create_user,
+            db,
+            username=user_data.username,
+            email=user_data.email,
+            password=user_data.password,
+            full_name=user_data.full_name
+        )
     )
     
     # Create access token
@@ -87,7 +94,11 @@ async def register(user_data: UserRegister, db: Session = Depends(get_db)):
 @router.post("/login", response_model=TokenResponse)
 async def login(user_data: UserLogin, db: Session = Depends(get_db)):
     """Login user"""
-    user = authenticate_user(db, user_data.username, user_data.password)
+    loop = asyncio.get_event_loop()
+    user = await loop.run_in_executor(
+        None,
+        partial(authenticate_user, db, user_data.username, user_data.password)
+    )
     
     if not user:
         raise HTTPException(
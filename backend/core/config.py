@@ -69,6 +69,7 @@ class Settings(BaseSettings):
     MAX_CONCURRENT_TASKS: int = 3
     TASK_TIMEOUT: int = 300  # seconds
     CLEANUP_INTERVAL: int = 3600  # seconds
+    RESULT_CACHE_MAX_MB: int = 1024  # Replicate result cache; least recently used evicted
     
     # Database (Optional)
     DATABASE_URL: Optional[str] = None
@@ -22,10 +22,13 @@ def save_task_with_chat(
     task_type: str,
     prompt: Optional[str] = None,
     parameters: Optional[Dict] = None,
-    session_id: Optional[str] = None
+    session_id: Optional[str] = None,
+    commit: bool = True
 ) -> str:
     """
     Save task to history and create initial chat message
+    Session, task and message are written in one transaction; pass
+    commit=False to leave it open for the caller's next write.
     Returns session_id
     """
     try:
@@ -40,7 +43,8 @@ def save_task_with_chat(
             user_id=user_id,
             session_id=session_id,
             title=title,
-            task_type=task_type
+            task_type=task_type,
+            commit=False
         )
         
         # Save task to history
@@ -50,7 +54,8 @@ def save_task_with_chat(
             task_id=task_id,
             task_type=task_type,
             prompt=prompt,
-            parameters=parameters
+            parameters=parameters,
+            commit=False
         )
         
         # Create user message in chat history
@@ -65,13 +70,15 @@ def save_task_with_chat(
                 "task_id": task_id,
                 "task_type": task_type,
                 "parameters": parameters
-            }
+            },
+            commit=commit
         )
         
         logger.info(f"Saved task {task_id} with chat history for user {user_id}")
         return session_id
         
     except Exception as e:
+        db.rollback()
         logger.error(f"Failed to save task with chat: {e}")
         return session_id or generate_session_id()
 
@@ -83,10 +90,12 @@ def update_task_result(
     session_id: str,
     status: str,
     result_path: Optional[str] = None,
-    error_message: Optional[str] = None
+    error_message: Optional[str] = None,
+    commit: bool = True
 ):
     """
     Update task status and add assistant response to chat
+    Both writes share one transaction; pass commit=False to leave it open.
     """
     try:
         # Update task status
@@ -95,7 +104,8 @@ def update_task_result(
             task_id=task_id,
             status=status,
             result_url=result_path,
-            error_message=error_message
+            error_message=error_message,
+            commit=False
         )
         
         # Create assistant message
@@ -127,12 +137,14 @@ def update_task_result(
             session_id=session_id,
             role="assistant",
             message=assistant_message,
-            extra_data=extra_data
+            extra_data=extra_data,
+            commit=commit
         )
         
         logger.info(f"Updated task {task_id} result with status: {status}")
         
     except Exception as e:
+        db.rollback()
         logger.error(f"Failed to update task result: {e}")
 
 
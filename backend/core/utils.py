@@ -1,27 +1,36 @@
 """
 Core utilities for Deep Vision
 """
-import uuid
 import hashlib
+import mmap
+import os
+import random
+import re
+import secrets
 from pathlib import Path
 from typing import Optional
-from datetime import datetime
 import asyncio
 from functools import wraps
+import threading
 import time
 
 
 def generate_task_id() -> str:
     """Generate unique task ID"""
-    return f"task_{uuid.uuid4().hex[:12]}"
+    return f"task_{secrets.token_hex(6)}"
 
 
 def generate_file_hash(file_path: Path) -> str:
     """Generate SHA256 hash of file"""
     sha256_hash = hashlib.sha256()
     with open(file_path, "rb") as f:
-        for byte_block in iter(lambda: f.read(4096), b""):
-            sha256_hash.update(byte_block)
+        if os.fstat(f.fileno()).st_size == 0:
+            return sha256_hash.hexdigest()
+        # Map the file and hash it in one update() - no per-chunk copies into Python
+        with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+            if hasattr(mm, "madvise") and hasattr(mmap, "MADV_SEQUENTIAL"):
+                mm.madvise(mmap.MADV_SEQUENTIAL)
+            sha256_hash.update(mm)
     return sha256_hash.hexdigest()
 
 
@@ -30,35 +39,71 @@ def get_file_size_mb(file_path: Path) -> float:
     return file_path.stat().st_size / (1024 * 1024)
 
 
+_timestamp_prefix: tuple[int, str] = (-1, "")
+
+
 def get_timestamp() -> str:
-    """Get current timestamp as string"""
-    return datetime.now().isoformat()
+    """Get current local timestamp as an ISO 8601 string with microseconds"""
+    global _timestamp_prefix
+    sec, ns = divmod(time.time_ns(), 1_000_000_000)
+    cached_sec, prefix = _timestamp_prefix
+    if sec != cached_sec:
+        # Format the date/time part only once per second
+        prefix = time.strftime("%Y-%m-%dT%H:%M:%S", time.localtime(sec))
+        _timestamp_prefix = (sec, prefix)
+    return f"{prefix}.{ns // 1000:06d}"
 
 
-def sanitize_filename(filename: str) -> str:
-    """Sanitize filename to prevent path traversal"""
-    # Remove any path separators
-    filename = filename.replace("/", "_").replace("\\", "_")
-    # Remove any dangerous characters
-    filename = "".join(c for c in filename if c.isalnum() or c in "._- ")
-    return filename
+_PATH_SEPARATORS = str.maketrans({"/": "_", "\\": "_"})
+_UNSAFE_FILENAME_CHARS = re.compile(r"[^\w.\- ]")
 
 
-def retry_async(max_retries: int = 3, delay: float = 1.0):
-    """Decorator for retrying async functions"""
+def sanitize_filename(filename: str) -> str:
+    """Sanitize filename to prevent path traversal"""
+    # Replace path separators, then drop anything that isn't alphanumeric or "._- "
+    return _UNSAFE_FILENAME_CHARS.sub("", filename.translate(_PATH_SEPARATORS))
+
+
+# Transport-level failures worth retrying; HTTP status errors are not included.
+# httpx/requests exceptions don't subclass the built-ins, so add them when available.
+RETRYABLE_ERRORS: tuple[type[BaseException], ...] = (TimeoutError, ConnectionError)
+try:
+    import httpx
+    RETRYABLE_ERRORS += (httpx.TransportError,)
+except ImportError:
+    pass
+try:
+    import requests
+    RETRYABLE_ERRORS += (requests.ConnectionError, requests.Timeout)
+except ImportError:
+    pass
+
+
+def retry_async(
+    max_retries: int = 3,
+    delay: float = 1.0,
+    max_delay: float = 30.0,
+    retry_on: tuple[type[BaseException], ...] = RETRYABLE_ERRORS
+):
+    """
+    Decorator for retrying async functions
+    
+    Waits a random time up to ``delay * 2**attempt`` (capped at ``max_delay``)
+    between attempts. Only exceptions in ``retry_on`` are retried; anything
+    else, including cancellation, propagates immediately.
+    """
     def decorator(func):
         @wraps(func)
         async def wrapper(*args, **kwargs):
-            last_exception = None
             for attempt in range(max_retries):
                 try:
                     return await func(*args, **kwargs)
-                except Exception as e:
-                    last_exception = e
-                    if attempt < max_retries - 1:
-                        await asyncio.sleep(delay * (attempt + 1))
-                    continue
-            raise last_exception
+                except asyncio.CancelledError:
+                    raise
+                except retry_on:
+                    if attempt == max_retries - 1:
+                        raise
+                    await asyncio.sleep(random.uniform(0, min(max_delay, delay * 2 ** attempt)))
         return wrapper
     return decorator
 
@@ -86,17 +131,75 @@ def measure_time(func):
     return sync_wrapper
 
 
+class TTLCache:
+    """Small thread-safe in-process cache whose entries expire after ``ttl`` seconds"""
+    
+    def __init__(self, maxsize: int = 10_000, ttl: float = 60.0):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._data: dict = {}
+        self._lock = threading.Lock()
+    
+    def get(self, key, default=None):
+        """Return cached value, or ``default`` if missing or expired"""
+        with self._lock:
+            item = self._data.get(key)
+            if item is None:
+                return default
+            value, expires_at = item
+            if expires_at < time.monotonic():
+                del self._data[key]
+                return default
+            return value
+    
+    def set(self, key, value) -> None:
+        """Store value, evicting the oldest entry when full"""
+        with self._lock:
+            if key not in self._data and len(self._data) >= self.maxsize:
+                self._data.pop(next(iter(self._data)))
+            self._data[key] = (value, time.monotonic() + self.ttl)
+    
+    def pop(self, key, default=None):
+        """Remove and return a cached value"""
+        with self._lock:
+            item = self._data.pop(key, None)
+            return default if item is None else item[0]
+    
+    def discard_value(self, value) -> None:
+        """Remove every entry that maps to ``value``"""
+        with self._lock:
+            for key in [k for k, (v, _) in self._data.items() if v == value]:
+                del self._data[key]
+    
+    def clear(self) -> None:
+        with self._lock:
+            self._data.clear()
+
+
 class ImageValidator:
     """Validate image files"""
     
-    ALLOWED_EXTENSIONS = {".jpg", ".jpeg", ".png", ".webp", ".bmp"}
+    ALLOWED_EXTENSIONS = frozenset({".jpg", ".jpeg", ".png", ".webp", ".bmp"})
     MAX_FILE_SIZE_MB = 10
+    # Number of leading bytes needed by validate_magic
+    MAGIC_HEADER_SIZE = 12
     
     @classmethod
     def validate_extension(cls, filename: str) -> bool:
         """Check if file extension is allowed"""
-        ext = Path(filename).suffix.lower()
-        return ext in cls.ALLOWED_EXTENSIONS
+        i = filename.rfind(".")
+        # Same as Path(filename).suffix: a leading dot (".png", "dir/.png") is not an extension
+        return i > 0 and filename[i - 1] not in "/\\" and filename[i:].lower() in cls.ALLOWED_EXTENSIONS
+    
+    @classmethod
+    def validate_magic(cls, head: bytes) -> bool:
+        """Check the leading bytes for a JPEG, PNG, WEBP or BMP signature"""
+        return (
+            head.startswith(b"\xff\xd8\xff")
+            or head.startswith(b"\x89PNG\r\n\x1a\n")
+            or (head[:4] == b"RIFF" and head[8:12] == b"WEBP")
+            or head.startswith(b"BM")
+        )
     
     @classmethod
     def validate_size(cls, file_size_bytes: int) -> bool:
@@ -105,12 +208,20 @@ class ImageValidator:
         return size_mb <= cls.MAX_FILE_SIZE_MB
     
     @classmethod
-    def validate_file(cls, filename: str, file_size: int) -> tuple[bool, Optional[str]]:
-        """Validate file extension and size"""
+    def validate_file(
+        cls,
+        filename: str,
+        file_size: int,
+        head: Optional[bytes] = None
+    ) -> tuple[bool, Optional[str]]:
+        """Validate file extension, size and (when ``head`` is given) content signature"""
         if not cls.validate_extension(filename):
-            return False, f"File type not allowed. Allowed types: {', '.join(cls.ALLOWED_EXTENSIONS)}"
+            return False, f"File type not allowed. Allowed types: {', '.join(sorted(cls.ALLOWED_EXTENSIONS))}"
         
         if not cls.validate_size(file_size):
             return False, f"File size exceeds {cls.MAX_FILE_SIZE_MB}MB limit"
         
+        if head is not None and not cls.validate_magic(head):
+            return False, "File content is not a supported image"
+        
         return True, None
@@ -1,27 +1,20 @@
 """
 Migration script to add chat_sessions table
-Run this once to update the database schema
+Run this once to update the database schema (init_db also backfills missing sessions)
 """
-from sqlalchemy import create_engine, inspect
-from backend.database.models import Base, ChatSession
-from backend.database.database import DATABASE_URL, engine as db_engine
+from backend.database.models import ChatSession
+from backend.database.database import backfill_chat_sessions, create_tables, engine as db_engine
 from loguru import logger
 
 def add_chat_sessions_table():
     """Add chat_sessions table to database"""
     try:
-        # Use the existing engine from database module
-        engine = db_engine
+        # Creates the table (and its indexes) only if missing
+        create_tables([ChatSession.__table__])
+        logger.info("chat_sessions table is present")
         
-        # Check if table exists
-        inspector = inspect(engine)
-        if 'chat_sessions' in inspector.get_table_names():
-            logger.info("chat_sessions table already exists")
-            return
-        
-        # Create only the chat_sessions table
-        ChatSession.__table__.create(bind=engine)
-        logger.info("Successfully created chat_sessions table")
+        with db_engine.begin() as conn:
+            backfill_chat_sessions(conn)
         
     except Exception as e:
         logger.error(f"Failed to create chat_sessions table: {e}")
@@ -0,0 +1,28 @@
+"""
+Migration script to add the user_stats summary table
+Run this to rebuild the counters; init_db backfills them when it creates the table
+"""
+from backend.database.models import UserStats
+from backend.database.database import backfill_user_stats, engine as db_engine
+from loguru import logger
+
+def add_user_stats_table():
+    """
+    Add user_stats table and rebuild its counters from existing history
+    
+    Safe to re-run: counters are recomputed from task_history / chat_messages.
+    """
+    try:
+        with db_engine.begin() as conn:
+            conn.exec_driver_sql("BEGIN IMMEDIATE")
+            UserStats.__table__.create(bind=conn, checkfirst=True)
+            backfill_user_stats(conn)
+        
+    except Exception as e:
+        logger.error(f"Failed to create user_stats table: {e}")
+        raise
+
+if __name__ == "__main__":
+    logger.info("Adding user_stats table to database...")
+    add_user_stats_table()
+    logger.info("Migration completed!")
@@ -2,12 +2,49 @@
 CRUD operations for database
 """
 from sqlalchemy.orm import Session
-from sqlalchemy import desc, and_
+from sqlalchemy import desc, and_, or_, update, select, bindparam
 from typing import List, Optional, Dict, Any
 from datetime import datetime, timedelta
 from loguru import logger
+import hashlib
+import hmac
+import secrets
+import threading
 
-from backend.database.models import User, ChatMessage, ChatSession, TaskHistory, APIKey
+from backend.database.models import (
+    User, ChatMessage, ChatSession, TaskHistory, APIKey, UserStats, bump_user_stats
+)
+from backend.core.utils import TTLCache
+
+
+# Short-lived login cache so repeat requests skip bcrypt. Keys are digests, never raw secrets.
+_AUTH_CACHE_SECRET = secrets.token_bytes(32)
+_login_cache = TTLCache(maxsize=10_000, ttl=30)  # (username, hmac(password)) -> user_id
+
+
+# last_login / last_used stamps are buffered here and written in one batch by
+# flush_pending_timestamps() instead of committing on every authenticated request.
+_pending_last_login: Dict[int, datetime] = {}
+_pending_last_used: Dict[int, datetime] = {}
+_pending_lock = threading.Lock()
+
+
+# Hot-path lookups built once at import; SQLAlchemy caches their compiled SQL
+_SELECT_USER_BY_USERNAME = select(User).where(User.username == bindparam("username")).limit(1)
+_SELECT_TASK_BY_TASK_ID = select(TaskHistory).where(TaskHistory.task_id == bindparam("task_id")).limit(1)
+_API_KEY_USABLE = and_(
+    APIKey.is_active == True,
+    or_(APIKey.expires_at.is_(None), APIKey.expires_at > bindparam("now"))
+)
+_SELECT_ACTIVE_API_KEY = select(APIKey).where(
+    APIKey.key == bindparam("key"),
+    _API_KEY_USABLE
+).limit(1)
+
+
+def _login_digest(username: str, password: str) -> tuple:
+    mac = hmac.new(_AUTH_CACHE_SECRET, password.encode("utf-8"), hashlib.sha256).hexdigest()
+    return username, mac
 
 
 # ==================== USER OPERATIONS ====================
@@ -28,14 +65,13 @@ def create_user(
     user.set_password(password)
     db.add(user)
     db.commit()
-    db.refresh(user)
     logger.info(f"Created user: {username}")
     return user
 
 
 def get_user_by_username(db: Session, username: str) -> Optional[User]:
     """Get user by username"""
-    return db.query(User).filter(User.username == username).first()
+    return db.execute(_SELECT_USER_BY_USERNAME, {"username": username}).scalar_one_or_none()
 
 
 def get_user_by_email(db: Session, email: str) -> Optional[User]:
@@ -44,22 +80,34 @@ def get_user_by_email(db: Session, email: str) -> Optional[User]:
 
 
 def get_user_by_id(db: Session, user_id: int) -> Optional[User]:
-    """Get user by ID"""
-    return db.query(User).filter(User.id == user_id).first()
+    """Get user by ID (served from the session identity map when already loaded)"""
+    return db.get(User, user_id)
 
 
 def authenticate_user(db: Session, username: str, password: str) -> Optional[User]:
     """Authenticate user with username and password"""
+    cache_key = _login_digest(username, password)
+    user_id = _login_cache.get(cache_key)
+    if user_id is not None:
+        user = get_user_by_id(db, user_id)
+        if user:
+            return user
+    
     user = get_user_by_username(db, username)
     if not user:
         return None
+    old_hash = user.password_hash
     if not user.verify_password(password):
         return None
+    if user.password_hash != old_hash:
+        db.commit()
     
-    # Update last login
+    # Update last login (persisted by flush_pending_timestamps)
     user.last_login = datetime.utcnow()
-    db.commit()
+    with _pending_lock:
+        _pending_last_login[user.id] = user.last_login
     
+    _login_cache.set(cache_key, user.id)
     return user
 
 
@@ -75,6 +123,7 @@ def update_user(db: Session, user_id: int, **kwargs) -> Optional[User]:
     
     db.commit()
     db.refresh(user)
+    _login_cache.discard_value(user_id)
     return user
 
 
@@ -85,15 +134,23 @@ def create_or_update_chat_session(
     user_id: int,
     session_id: str,
     title: Optional[str] = None,
-    task_type: str = "chat"
-) -> ChatSession:
-    """Create new chat session or update existing one"""
+    task_type: str = "chat",
+    commit: bool = True
+) -> Optional[ChatSession]:
+    """
+    Create new chat session or update existing one
+    
+    session_id is globally unique: a session owned by another user is left
+    untouched and None is returned. Pass commit=False when inside an outer
+    transaction.
+    """
     session = db.query(ChatSession).filter(
-        ChatSession.session_id == session_id,
-        ChatSession.user_id == user_id
+        ChatSession.session_id == session_id
     ).first()
     
     if session:
+        if session.user_id != user_id:
+            return None
         # Update existing session
         if title and not session.title:
             session.title = title
@@ -108,8 +165,10 @@ def create_or_update_chat_session(
         )
         db.add(session)
     
-    db.commit()
-    db.refresh(session)
+    if commit:
+        db.commit()
+    else:
+        db.flush()
     return session
 
 
@@ -138,9 +197,10 @@ def create_chat_message(
     session_id: str,
     role: str,
     message: str,
-    extra_data: Optional[Dict] = None
+    extra_data: Optional[Dict] = None,
+    commit: bool = True
 ) -> ChatMessage:
-    """Create new chat message"""
+    """Create new chat message (pass commit=False when inside an outer transaction)"""
     chat = ChatMessage(
         user_id=user_id,
         session_id=session_id,
@@ -149,8 +209,10 @@ def create_chat_message(
         extra_data=extra_data
     )
     db.add(chat)
-    db.commit()
-    db.refresh(chat)
+    if commit:
+        db.commit()
+    else:
+        db.flush()
     return chat
 
 
@@ -170,10 +232,10 @@ def get_chat_history(
 
 
 def get_user_sessions(db: Session, user_id: int) -> List[str]:
-    """Get all session IDs for a user"""
-    sessions = db.query(ChatMessage.session_id).filter(
-        ChatMessage.user_id == user_id
-    ).distinct().all()
+    """Get all session IDs for a user, most recently updated first"""
+    sessions = db.query(ChatSession.session_id).filter(
+        ChatSession.user_id == user_id
+    ).order_by(desc(ChatSession.updated_at)).all()
     
     return [s[0] for s in sessions]
 
@@ -186,6 +248,14 @@ def delete_chat_session(db: Session, user_id: int, session_id: str) -> int:
             ChatMessage.session_id == session_id
         )
     ).delete()
+    db.query(ChatSession).filter(
+        and_(
+            ChatSession.user_id == user_id,
+            ChatSession.session_id == session_id
+        )
+    ).delete()
+    if deleted:
+        bump_user_stats(db.connection(), user_id, total_messages=-deleted)
     db.commit()
     return deleted
 
@@ -198,9 +268,10 @@ def create_task(
     task_id: str,
     task_type: str,
     prompt: Optional[str] = None,
-    parameters: Optional[Dict] = None
+    parameters: Optional[Dict] = None,
+    commit: bool = True
 ) -> TaskHistory:
-    """Create new task"""
+    """Create new task (pass commit=False when inside an outer transaction)"""
     task = TaskHistory(
         user_id=user_id,
         task_id=task_id,
@@ -209,22 +280,25 @@ def create_task(
         parameters=parameters
     )
     db.add(task)
-    db.commit()
-    db.refresh(task)
+    if commit:
+        db.commit()
+    else:
+        db.flush()
     return task
 
 
 def get_task_by_id(db: Session, task_id: str) -> Optional[TaskHistory]:
     """Get task by ID"""
-    return db.query(TaskHistory).filter(TaskHistory.task_id == task_id).first()
+    return db.execute(_SELECT_TASK_BY_TASK_ID, {"task_id": task_id}).scalar_one_or_none()
 
 
 def update_task(
     db: Session,
     task_id: str,
+    commit: bool = True,
     **kwargs
 ) -> Optional[TaskHistory]:
-    """Update task"""
+    """Update task (pass commit=False when inside an outer transaction)"""
     task = get_task_by_id(db, task_id)
     if not task:
         return None
@@ -233,8 +307,11 @@ def update_task(
         if hasattr(task, key):
             setattr(task, key, value)
     
-    db.commit()
-    db.refresh(task)
+    if commit:
+        db.commit()
+        db.refresh(task)
+    else:
+        db.flush()
     return task
 
 
@@ -283,26 +360,22 @@ def create_api_key(
     )
     db.add(api_key)
     db.commit()
-    db.refresh(api_key)
     logger.info(f"Created API key for user {user_id}")
     return api_key
 
 
 def get_user_by_api_key(db: Session, api_key: str) -> Optional[User]:
-    """Get user by API key"""
-    key_obj = db.query(APIKey).filter(
-        and_(
-            APIKey.key == api_key,
-            APIKey.is_active == True
-        )
-    ).first()
+    """Get user by API key (revocation and expiry take effect immediately)"""
+    now = datetime.utcnow()
+    key_obj = db.execute(_SELECT_ACTIVE_API_KEY, {"key": api_key, "now": now}).scalar_one_or_none()
     
     if not key_obj:
         return None
     
-    # Update last used
-    key_obj.last_used = datetime.utcnow()
-    db.commit()
+    # Update last used (persisted by flush_pending_timestamps)
+    key_obj.last_used = now
+    with _pending_lock:
+        _pending_last_used[key_obj.id] = key_obj.last_used
     
     return key_obj.user
 
@@ -318,23 +391,39 @@ def revoke_api_key(db: Session, key_id: int) -> bool:
     return True
 
 
+def flush_pending_timestamps(db: Session) -> int:
+    """Write buffered last_login / last_used stamps in a single transaction"""
+    global _pending_last_login, _pending_last_used
+    with _pending_lock:
+        logins, _pending_last_login = _pending_last_login, {}
+        used, _pending_last_used = _pending_last_used, {}
+    
+    if not logins and not used:
+        return 0
+    
+    try:
+        if logins:
+            db.execute(update(User), [{"id": k, "last_login": v} for k, v in logins.items()])
+        if used:
+            db.execute(update(APIKey), [{"id": k, "last_used": v} for k, v in used.items()])
+        db.commit()
+    except Exception:
+        db.rollback()
+        # Put the stamps back for the next flush; entries buffered meanwhile are newer
+        with _pending_lock:
+            for k, v in logins.items():
+                _pending_last_login.setdefault(k, v)
+            for k, v in used.items():
+                _pending_last_used.setdefault(k, v)
+        raise
+    return len(logins) + len(used)
+
+
 # ==================== STATISTICS ====================
 
 def get_user_stats(db: Session, user_id: int) -> Dict[str, Any]:
-    """Get user statistics"""
-    total_tasks = db.query(TaskHistory).filter(TaskHistory.user_id == user_id).count()
-    completed_tasks = db.query(TaskHistory).filter(
-        and_(
-            TaskHistory.user_id == user_id,
-            TaskHistory.status == "completed"
-        )
-    ).count()
-    total_messages = db.query(ChatMessage).filter(ChatMessage.user_id == user_id).count()
-    
-    return {
-        "total_tasks": total_tasks,
-        "completed_tasks": completed_tasks,
-        "failed_tasks": total_tasks - completed_tasks,
-        "total_messages": total_messages,
-        "success_rate": (completed_tasks / total_tasks * 100) if total_tasks > 0 else 0
-    }
\ No newline at end of file
+    """Get user statistics from the pre-aggregated user_stats row"""
+    stats = db.get(UserStats, user_id)
+    if not stats:
+        stats = UserStats(user_id=user_id, total_tasks=0, completed_tasks=0, total_messages=0)
+    return stats.to_dict()
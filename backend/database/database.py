@@ -1,14 +1,27 @@
 """
 Database connection and session management
 """
-from sqlalchemy import create_engine
+from sqlalchemy import create_engine, event, inspect, text
 from sqlalchemy.orm import sessionmaker, Session
 from contextlib import contextmanager
 from pathlib import Path
 from loguru import logger
 from typing import Generator
 
-from backend.database.models import Base
+from backend.database.models import Base, UserStats
+
+try:
+    import orjson
+    
+    def _json_serializer(obj) -> str:
+        return orjson.dumps(obj, option=orjson.OPT_NON_STR_KEYS).decode("utf-8")
+    
+    _json_deserializer = orjson.loads
+except ImportError:
+    import json
+    
+    _json_serializer = json.dumps
+    _json_deserializer = json.loads
 
 # Database path
 DB_DIR = Path(__file__).parent.parent.parent / "data"
@@ -22,17 +35,104 @@ DATABASE_URL = f"sqlite:///{DB_PATH}"
 engine = create_engine(
     DATABASE_URL,
     connect_args={"check_same_thread": False},  # Needed for SQLite
+    query_cache_size=1200,  # Compiled-SQL cache entries (default 500)
+    json_serializer=_json_serializer,  # JSON columns (extra_data, parameters, result_data)
+    json_deserializer=_json_deserializer,
     echo=False  # Set to True for SQL query logging
 )
 
+
+@event.listens_for(engine, "connect")
+def _set_sqlite_pragmas(dbapi_connection, connection_record):
+    """Tune every new SQLite connection: WAL lets readers run alongside the writer"""
+    cursor = dbapi_connection.cursor()
+    cursor.execute("PRAGMA journal_mode=WAL")
+    cursor.execute("PRAGMA synchronous=NORMAL")  # Safe with WAL, one fsync per checkpoint
+    cursor.execute("PRAGMA temp_store=MEMORY")
+    cursor.execute("PRAGMA mmap_size=268435456")  # 256 MB
+    cursor.execute("PRAGMA cache_size=-65536")  # 64 MB
+    cursor.execute("PRAGMA busy_timeout=5000")
+    cursor.close()
+
 # Create session factory
-SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+# expire_on_commit=False: objects keep their loaded/defaulted values after commit,
+# so create_* helpers don't need a refresh SELECT before returning them
+SessionLocal = sessionmaker(autocommit=False, autoflush=False, expire_on_commit=False, bind=engine)
+
+
+@event.listens_for(SessionLocal, "after_commit")
+def _expire_core_maintained(session):
+    """
+    Expire rows that are written behind the ORM's back
+    
+    user_stats counters are bumped by Core upserts (bump_user_stats), so with
+    expire_on_commit=False a loaded UserStats would keep stale values.
+    """
+    for obj in list(session.identity_map.values()):
+        if isinstance(obj, UserStats):
+            session.expire(obj)
+
+
+def create_tables(tables=None):
+    """
+    Create missing tables in a single transaction
+    
+    pysqlite doesn't open a transaction for DDL on its own, so BEGIN IMMEDIATE
+    is issued explicitly: all CREATE TABLE/INDEX statements share one commit.
+    """
+    with engine.begin() as conn:
+        conn.exec_driver_sql("BEGIN IMMEDIATE")
+        Base.metadata.create_all(bind=conn, tables=tables, checkfirst=True)
+
+
+def backfill_user_stats(conn):
+    """Rebuild user_stats counters from task_history / chat_messages"""
+    conn.execute(text("DELETE FROM user_stats"))
+    result = conn.execute(text(
+        "INSERT INTO user_stats (user_id, total_tasks, completed_tasks, total_messages, updated_at) "
+        "SELECT u.id, "
+        "(SELECT COUNT(*) FROM task_history t WHERE t.user_id = u.id), "
+        "(SELECT COUNT(*) FROM task_history t WHERE t.user_id = u.id AND t.status = 'completed'), "
+        "(SELECT COUNT(*) FROM chat_messages m WHERE m.user_id = u.id), "
+        "CURRENT_TIMESTAMP "
+        "FROM users u"
+    ))
+    logger.info(f"Backfilled user_stats for {result.rowcount} users")
+
+
+def backfill_chat_sessions(conn):
+    """Create chat_sessions rows for sessions that only exist in chat_messages"""
+    conn.execute(text(
+        "CREATE INDEX IF NOT EXISTS ix_chat_sessions_user_updated "
+        "ON chat_sessions (user_id, updated_at)"
+    ))
+    result = conn.execute(text(
+        "INSERT INTO chat_sessions (user_id, session_id, title, task_type, created_at, updated_at) "
+        "SELECT MIN(user_id), session_id, 'Chat ' || substr(session_id, 1, 8), 'chat', "
+        "MIN(timestamp), MAX(timestamp) "
+        "FROM chat_messages "
+        "WHERE session_id IS NOT NULL "
+        "AND session_id NOT IN (SELECT session_id FROM chat_sessions) "
+        "GROUP BY session_id"
+    ))
+    if result.rowcount:
+        logger.info(f"Backfilled {result.rowcount} chat sessions")
 
 
 def init_db():
     """Initialize database - create all tables"""
     logger.info("Initializing database...")
-    Base.metadata.create_all(bind=engine)
+    with engine.begin() as conn:
+        conn.exec_driver_sql("BEGIN IMMEDIATE")
+        existing = set(inspect(conn).get_table_names())
+        Base.metadata.create_all(bind=conn, checkfirst=True)
+        
+        # user_stats is maintained incrementally; seed it when it's added to an existing DB
+        if "user_stats" not in existing and "users" in existing:
+            backfill_user_stats(conn)
+        
+        # Session listings read chat_sessions only; pick up sessions older than that table
+        backfill_chat_sessions(conn)
     logger.success(f"Database initialized at: {DB_PATH}")
 
 
@@ -63,6 +163,8 @@ def get_db_session() -> Generator[Session, None, None]:
 def reset_db():
     """Reset database - drop all tables and recreate"""
     logger.warning("Resetting database...")
-    Base.metadata.drop_all(bind=engine)
-    Base.metadata.create_all(bind=engine)
+    with engine.begin() as conn:
+        conn.exec_driver_sql("BEGIN IMMEDIATE")
+        Base.metadata.drop_all(bind=conn)
+        Base.metadata.create_all(bind=conn)
     logger.success("Database reset complete")
\ No newline at end of file
@@ -1,4 +1,5 @@
-from sqlalchemy import create_engine, Column, Integer, String, DateTime, Boolean, ForeignKey, Text, JSON
+from sqlalchemy import create_engine, Column, Integer, String, DateTime, Boolean, ForeignKey, Text, JSON, Index, event, inspect
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
 from sqlalchemy.ext.declarative import declarative_base
 from sqlalchemy.orm import relationship, sessionmaker
 from datetime import datetime
@@ -7,10 +8,14 @@ import secrets
 
 Base = declarative_base()
 
-# Configure bcrypt with proper settings for newer versions
+# argon2id for new hashes; bcrypt stays verifiable and is upgraded on next login
 pwd_context = CryptContext(
-    schemes=["bcrypt"],
+    schemes=["argon2", "bcrypt"],
     deprecated="auto",
+    argon2__type="ID",
+    argon2__time_cost=2,
+    argon2__memory_cost=19456,
+    argon2__parallelism=1,
     bcrypt__rounds=12,
     bcrypt__ident="2b"
 )
@@ -36,22 +41,29 @@ class User(Base):
     chat_sessions = relationship("ChatSession", back_populates="user", cascade="all, delete-orphan")
     task_history = relationship("TaskHistory", back_populates="user", cascade="all, delete-orphan")
     api_keys = relationship("APIKey", back_populates="user", cascade="all, delete-orphan")
+    stats = relationship("UserStats", uselist=False, cascade="all, delete-orphan")
     
     def set_password(self, password: str):
         """Hash and set password"""
-        # Truncate password to 72 bytes for bcrypt
-        if isinstance(password, str):
-            password_bytes = password.encode('utf-8')[:72]
-            password = password_bytes.decode('utf-8')
         self.password_hash = pwd_context.hash(password)
     
     def verify_password(self, password: str) -> bool:
         """Verify password"""
-        # Truncate password to 72 bytes for bcrypt
-        if isinstance(password, str):
-            password_bytes = password.encode('utf-8')[:72]
-            password = password_bytes.decode('utf-8')
-        return pwd_context.verify(password, self.password_hash)
+        if pwd_context.identify(self.password_hash) == "bcrypt":
+            # bcrypt only sees the first 72 bytes; passlib accepts bytes directly
+            raw = password.encode('utf-8') if isinstance(password, str) else password
+            if not pwd_context.verify(raw[:72], self.password_hash):
+                return False
+            # Legacy bcrypt hash - re-hash the full password with argon2;
+            # the caller's commit persists the upgrade
+            self.set_password(password)
+            return True
+        
+        valid, new_hash = pwd_context.verify_and_update(password, self.password_hash)
+        if valid and new_hash:
+            # argon2 parameters changed - caller's commit persists the re-hash
+            self.password_hash = new_hash
+        return valid
     
     def to_dict(self):
         """Convert to dictionary"""
@@ -81,6 +93,11 @@ class ChatSession(Base):
     
     # Relationships
     user = relationship("User", back_populates="chat_sessions")
+    
+    __table_args__ = (
+        # Covers get_user_sessions / get_user_chat_sessions (filter by user, newest first)
+        Index("ix_chat_sessions_user_updated", "user_id", "updated_at"),
+    )
 
 
 class ChatMessage(Base):
@@ -190,3 +207,84 @@ class APIKey(Base):
             "expires_at": self.expires_at.isoformat() if self.expires_at else None,
             "last_used": self.last_used.isoformat() if self.last_used else None
         }
+
+
+class UserStats(Base):
+    """Pre-aggregated per-user counters, maintained by the insert/update hooks below"""
+    __tablename__ = "user_stats"
+    
+    user_id = Column(Integer, ForeignKey("users.id"), primary_key=True)
+    total_tasks = Column(Integer, default=0, nullable=False)
+    completed_tasks = Column(Integer, default=0, nullable=False)
+    total_messages = Column(Integer, default=0, nullable=False)
+    updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+    
+    def to_dict(self):
+        total_tasks = self.total_tasks or 0
+        completed_tasks = self.completed_tasks or 0
+        return {
+            "total_tasks": total_tasks,
+            "completed_tasks": completed_tasks,
+            "failed_tasks": total_tasks - completed_tasks,
+            "total_messages": self.total_messages or 0,
+            "success_rate": (completed_tasks / total_tasks * 100) if total_tasks > 0 else 0
+        }
+
+
+def bump_user_stats(connection, user_id: int, **deltas: int):
+    """
+    Add deltas to a user's counters, creating the row on first use
+    
+    Called from the ORM hooks below; bulk statements bypass those hooks and
+    must call this themselves.
+    """
+    table = UserStats.__table__
+    stmt = sqlite_insert(table).values(
+        user_id=user_id,
+        total_tasks=max(deltas.get("total_tasks", 0), 0),
+        completed_tasks=max(deltas.get("completed_tasks", 0), 0),
+        total_messages=max(deltas.get("total_messages", 0), 0),
+        updated_at=datetime.utcnow()
+    )
+    stmt = stmt.on_conflict_do_update(
+        index_elements=[table.c.user_id],
+        set_={
+            **{name: table.c[name] + delta for name, delta in deltas.items()},
+            "updated_at": datetime.utcnow()
+        }
+    )
+    connection.execute(stmt)
+
+
+@event.listens_for(TaskHistory, "after_insert")
+def _task_inserted(mapper, connection, target):
+    bump_user_stats(
+        connection,
+        target.user_id,
+        total_tasks=1,
+        completed_tasks=1 if target.status == "completed" else 0
+    )
+
+
+@event.listens_for(TaskHistory, "after_update")
+def _task_updated(mapper, connection, target):
+    history = inspect(target).attrs.status.history
+    was_completed = "completed" in (history.deleted or ())
+    is_completed = "completed" in (history.added or ())
+    if is_completed != was_completed:
+        bump_user_stats(connection, target.user_id, completed_tasks=1 if is_completed else -1)
+
+
+def touch_chat_session(connection, session_id: str):
+    """Move a session's updated_at to now so listings order by latest activity"""
+    table = ChatSession.__table__
+    connection.execute(
+        table.update().where(table.c.session_id == session_id).values(updated_at=datetime.utcnow())
+    )
+
+
+@event.listens_for(ChatMessage, "after_insert")
+def _message_inserted(mapper, connection, target):
+    bump_user_stats(connection, target.user_id, total_messages=1)
+    if target.session_id:
+        touch_chat_session(connection, target.session_id)
@@ -8,10 +8,18 @@ from pathlib import Path
 from typing import Optional, Dict, Any
 from loguru import logger
 from PIL import Image
-import requests
+import httpx
+import asyncio
+import hashlib
+import json
+import os
+import shutil
+import uuid
+from functools import partial
 from io import BytesIO
 
 from backend.core.config import settings
+from backend.core.utils import retry_async
 
 
 class ReplicateWrapper:
@@ -19,8 +27,159 @@ class ReplicateWrapper:
     
     def __init__(self):
         self.client = replicate.Client(api_token=settings.REPLICATE_API_TOKEN)
+        
+        # Shared async client: keep-alive pool for result downloads from Replicate's CDN
+        self.http = httpx.AsyncClient(
+            limits=httpx.Limits(max_connections=100, max_keepalive_connections=20),
+            timeout=httpx.Timeout(60.0, connect=10.0),
+            transport=httpx.AsyncHTTPTransport(retries=3),
+            follow_redirects=True
+        )
+        
+        # Content-addressed results of deterministic models: one file per input hash
+        self.cache_dir = settings.CACHE_DIR / "replicate"
+        self.cache_dir.mkdir(parents=True, exist_ok=True)
         logger.info("Replicate client initialized")
     
+    async def aclose(self) -> None:
+        """Close pooled HTTP connections"""
+        await self.http.aclose()
+    
+    async def _run(self, model_version: str, input_params: Dict[str, Any]) -> Any:
+        """Run a Replicate model in the thread pool so the event loop stays free"""
+        loop = asyncio.get_event_loop()
+        return await loop.run_in_executor(
+            None,
+            partial(self.client.run, model_version, input=input_params)
+        )
+    
+    async def _upload(self, path: Path) -> str:
+        """Upload a local file to Replicate's file store and return its URL"""
+        def upload() -> str:
+            with open(path, "rb") as f:
+                return self.client.files.create(f).urls["get"]
+        
+        loop = asyncio.get_event_loop()
+        return await loop.run_in_executor(None, upload)
+    
+    def _cache_key(
+        self,
+        model_version: str,
+        files: Dict[str, Optional[Path]],
+        params: Dict[str, Any]
+    ) -> str:
+        """Hash model version, input file contents and parameters"""
+        h = hashlib.blake2b(digest_size=16)
+        h.update(model_version.encode("utf-8"))
+        for name, path in sorted(files.items()):
+            h.update(name.encode("utf-8"))
+            if path is None:
+                continue
+            with open(path, "rb") as f:
+                for block in iter(lambda: f.read(1 << 20), b""):
+                    h.update(block)
+        h.update(json.dumps(params, sort_keys=True, default=str).encode("utf-8"))
+        return h.hexdigest()
+    
+    def _cache_fetch(self, key: str, output_path: Path) -> bool:
+        """Copy a cached result to output_path; False on miss"""
+        cached = self.cache_dir / key
+        try:
+            shutil.copyfile(cached, output_path)
+            os.utime(cached)  # Mark as recently used for eviction
+        except FileNotFoundError:
+            return False
+        return True
+    
+    def _cache_store(self, key: str, output_path: Path) -> None:
+        """Atomically add output_path to the cache"""
+        tmp = self.cache_dir / f"{key}.{uuid.uuid4().hex}.tmp"
+        try:
+            shutil.copyfile(output_path, tmp)
+            os.replace(tmp, self.cache_dir / key)
+        except OSError as e:
+            logger.warning(f"Failed to cache result {key}: {e}")
+            tmp.unlink(missing_ok=True)
+            return
+        self._cache_prune()
+    
+    def _cache_prune(self) -> None:
+        """Evict least recently used results until the cache fits RESULT_CACHE_MAX_MB"""
+        entries = []
+        total = 0
+        with os.scandir(self.cache_dir) as it:
+            for entry in it:
+                if entry.is_file() and not entry.name.endswith(".tmp"):
+                    stat = entry.stat()
+                    entries.append((stat.st_mtime, stat.st_size, entry.path))
+                    total += stat.st_size
+        
+        limit = settings.RESULT_CACHE_MAX_MB * 1024 * 1024
+        for _, size, path in sorted(entries):
+            if total <= limit:
+                break
+            try:
+                os.unlink(path)
+                total -= size
+            except FileNotFoundError:
+                pass
+    
+    async def _run_cached(
+        self,
+        model_version: str,
+        files: Dict[str, Optional[Path]],
+        params: Dict[str, Any],
+        output_path: Path
+    ) -> Path:
+        """
+        Run a deterministic image model, reusing a cached result for identical inputs
+        
+        Args:
+            model_version: Replicate model version
+            files: Model input name -> local file to upload (None entries are skipped)
+            params: Remaining model inputs
+            output_path: Where to write the result
+        """
+        loop = asyncio.get_event_loop()
+        # Hashing and copying whole files: keep it off the event loop
+        cache_key = await loop.run_in_executor(
+            None, self._cache_key, model_version, files, params
+        )
+        if await loop.run_in_executor(None, self._cache_fetch, cache_key, output_path):
+            logger.info(f"Result served from cache: {output_path}")
+            return output_path
+        
+        input_params = {
+            name: await self._upload(path)
+            for name, path in files.items()
+            if path is not None
+        }
+        input_params.update(params)
+        
+        output = await self._run(model_version, input_params)
+        
+        if not isinstance(output, str):
+            logger.error(f"Unexpected output type: {type(output)}")
+            raise ValueError("Invalid output from Replicate")
+        
+        await self.download(output, output_path)
+        await loop.run_in_executor(None, self._cache_store, cache_key, output_path)
+        return output_path
+    
+    @retry_async()
+    async def download(self, url: str, output_path: Path) -> None:
+        """
+        Stream a result URL to output_path in 1 MiB chunks (constant memory)
+        
+        Dropped connections and read timeouts restart the download; the
+        transport's own retries only cover connecting.
+        """
+        async with self.http.stream("GET", url) as response:
+            response.raise_for_status()
+            with open(output_path, "wb") as f:
+                async for chunk in response.aiter_bytes(1 << 20):
+                    f.write(chunk)
+    
     async def inpaint_image(
         self,
         image_path: Path,
@@ -45,39 +204,19 @@ class ReplicateWrapper:
             # https://replicate.com/lucataco/lama
             model_version = "lucataco/lama:b1e57e8c559baf0eb0bfbf9b6c1b2c38c94a76bffb1b69c9cadb38a6d4285b77"
             
-            with open(image_path, "rb") as image_file:
-                input_params = {
-                    "image": image_file,
-                }
-                
-                # Add mask if provided
-                if mask_path and mask_path.exists():
-                    with open(mask_path, "rb") as mask_file:
-                        input_params["mask"] = mask_file
-                
-                # Run the model
-                output = self.client.run(
-                    model_version,
-                    input=input_params
-                )
-            
-            # Download result
             output_path = image_path.parent.parent / "outputs" / f"inpaint_{image_path.name}"
             output_path.parent.mkdir(parents=True, exist_ok=True)
             
-            if isinstance(output, str):
-                # Download from URL
-                response = requests.get(output)
-                response.raise_for_status()
-                
-                with open(output_path, "wb") as f:
-                    f.write(response.content)
-                    
-                logger.info(f"Inpainting completed: {output_path}")
-                return output_path
-            else:
-                logger.error(f"Unexpected output type: {type(output)}")
-                raise ValueError("Invalid output from Replicate")
+            has_mask = bool(mask_path and mask_path.exists())
+            await self._run_cached(
+                model_version,
+                {"image": image_path, "mask": mask_path if has_mask else None},
+                {},
+                output_path
+            )
+            
+            logger.info(f"Inpainting completed: {output_path}")
+            return output_path
                 
         except Exception as e:
             logger.error(f"Inpainting error: {e}")
@@ -100,32 +239,21 @@ class ReplicateWrapper:
             # https://replicate.com/jingyunliang/swinir
             model_version = "jingyunliang/swinir:660d922d33153019e8c594a6ea8c64f77d58f35093c93e7a73ec38f0cb9c7b21"
             
-            with open(image_path, "rb") as image_file:
-                output = self.client.run(
-                    model_version,
-                    input={
-                        "image": image_file,
-                        "task_type": "real_sr",  # Real-world image super-resolution
-                        "scale": 2
-                    }
-                )
-            
-            # Download result
             output_path = image_path.parent.parent / "outputs" / f"deblur_{image_path.name}"
             output_path.parent.mkdir(parents=True, exist_ok=True)
             
-            if isinstance(output, str):
-                response = requests.get(output)
-                response.raise_for_status()
-                
-                with open(output_path, "wb") as f:
-                    f.write(response.content)
-                    
-                logger.info(f"Deblur completed: {output_path}")
-                return output_path
-            else:
-                logger.error(f"Unexpected output type: {type(output)}")
-                raise ValueError("Invalid output from Replicate")
+            await self._run_cached(
+                model_version,
+                {"image": image_path},
+                {
+                    "task_type": "real_sr",  # Real-world image super-resolution
+                    "scale": 2
+                },
+                output_path
+            )
+            
+            logger.info(f"Deblur completed: {output_path}")
+            return output_path
                 
         except Exception as e:
             logger.error(f"Deblur error: {e}")
@@ -148,32 +276,21 @@ class ReplicateWrapper:
             # https://replicate.com/tencentarc/gfpgan
             model_version = "tencentarc/gfpgan:9283608cc6b7be6b65a8e44983db012355fde4132009bf99d976b2f0896856a3"
             
-            with open(image_path, "rb") as image_file:
-                output = self.client.run(
-                    model_version,
-                    input={
-                        "img": image_file,
-                        "version": "v1.4",
-                        "scale": 2
-                    }
-                )
-            
-            # Download result
             output_path = image_path.parent.parent / "outputs" / f"beauty_{image_path.name}"
             output_path.parent.mkdir(parents=True, exist_ok=True)
             
-            if isinstance(output, str):
-                response = requests.get(output)
-                response.raise_for_status()
-                
-                with open(output_path, "wb") as f:
-                    f.write(response.content)
-                    
-                logger.info(f"Beauty enhancement completed: {output_path}")
-                return output_path
-            else:
-                logger.error(f"Unexpected output type: {type(output)}")
-                raise ValueError("Invalid output from Replicate")
+            await self._run_cached(
+                model_version,
+                {"img": image_path},
+                {
+                    "version": "v1.4",
+                    "scale": 2
+                },
+                output_path
+            )
+            
+            logger.info(f"Beauty enhancement completed: {output_path}")
+            return output_path
                 
         except Exception as e:
             logger.error(f"Beauty enhancement error: {e}")
@@ -197,9 +314,9 @@ class ReplicateWrapper:
             # https://replicate.com/stability-ai/sdxl
             model_version = "stability-ai/sdxl:39ed52f2a78e934b3ba6e2a89f5b1c712de7dfea535525255b1aa35c5565e08b"
             
-            output = self.client.run(
+            output = await self._run(
                 model_version,
-                input={
+                {
                     "prompt": prompt,
                     "negative_prompt": kwargs.get("negative_prompt", "ugly, blurry, low quality"),
                     "num_inference_steps": kwargs.get("num_inference_steps", 50),
@@ -212,14 +329,11 @@ class ReplicateWrapper:
             # Download result
             output_dir = settings.OUTPUT_DIR
             output_dir.mkdir(parents=True, exist_ok=True)
-            output_path = output_dir / f"generated_{prompt[:30].replace(' ', '_')}.png"
+            # Unique suffix: concurrent generations of one prompt must not share a file
+            output_path = output_dir / f"generated_{prompt[:30].replace(' ', '_')}_{uuid.uuid4().hex[:8]}.png"
             
             if isinstance(output, list) and len(output) > 0:
-                response = requests.get(output[0])
-                response.raise_for_status()
-                
-                with open(output_path, "wb") as f:
-                    f.write(response.content)
+                await self.download(output[0], output_path)
                     
                 logger.info(f"Image generation completed: {output_path}")
                 return output_path
@@ -234,3 +348,12 @@ class ReplicateWrapper:
 
 # Global instance
 replicate_client = ReplicateWrapper()
+
+# Enhancement task type -> bound method, shared by the API and chat routes
+# (inpaint uses LaMa, which can auto-detect objects without a mask)
+ENHANCEMENT_TASKS = {
+    "deblur": replicate_client.deblur_image,
+    "inpaint": replicate_client.inpaint_image,
+    "beauty_enhance": replicate_client.enhance_beauty,
+    "enhance": replicate_client.enhance_beauty,  # chat action name
+}
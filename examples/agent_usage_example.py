@@ -10,7 +10,7 @@ project_root = Path(__file__).parent.parent
 sys.path.insert(0, str(project_root))
 
 from backend.core.state import WorkflowState, TaskType
-from backend.agents.orchestrator import SimpleOrchestrator
+from backend.agents.orchestrator import get_orchestrator
 from backend.core.utils import generate_task_id
 
 
@@ -36,7 +36,7 @@ async def example_1_simple_workflow():
     print(f"   Input: {state.input_path}")
     
     # Create orchestrator
-    orchestrator = SimpleOrchestrator(use_llm_analyzer=False)  # No LLM for this example
+    orchestrator = get_orchestrator(use_llm_analyzer=False)  # No LLM for this example
     
     # Run workflow
     print(f"\n🚀 Starting workflow...")
@@ -73,7 +73,7 @@ async def example_2_with_llm_analyzer():
     print(f"   (No task_type specified, let LLM decide)")
     
     # Create orchestrator with LLM analyzer
-    orchestrator = SimpleOrchestrator(use_llm_analyzer=True)
+    orchestrator = get_orchestrator(use_llm_analyzer=True)
     
     # Run workflow
     print(f"\n🤖 LLM analyzing request...")
@@ -109,8 +109,10 @@ async def example_3_simple_rule_based():
     
     analyzer = SimpleTaskAnalyzer()
     
-    for request in requests:
-        result = await analyzer.analyze(request)
+    # Classify all requests in one call instead of awaiting each
+    results = await analyzer.analyze_batch(requests)
+    
+    for request, result in zip(requests, results):
         print(f"\n📝 Request: '{request}'")
         print(f"   → Task: {result['task_type']}")
         print(f"   → Confidence: {result['confidence']:.2%}")
@@ -175,7 +177,7 @@ async def example_5_error_handling():
     
     print(f"\n📝 Input: {state.input_path} (doesn't exist)")
     
-    orchestrator = SimpleOrchestrator(use_llm_analyzer=False)
+    orchestrator = get_orchestrator(use_llm_analyzer=False)
     
     print(f"\n🚀 Running workflow...")
     final_state = await orchestrator.run(state)
@@ -214,7 +216,7 @@ async def example_6_full_workflow():
     print(f"\n📦 Created task: {state.task_id}")
     
     # Step 2: Run through agents
-    orchestrator = SimpleOrchestrator(use_llm_analyzer=True)
+    orchestrator = get_orchestrator(use_llm_analyzer=True)
     
     print(f"\n🔄 Processing through agents:")
     print(f"   1️⃣ Task Analyzer - analyzing request...")
@@ -240,6 +242,11 @@ async def example_6_full_workflow():
             print(f"   {key}: {value}")
 
 
+async def run_examples(*examples):
+    """Run example coroutines concurrently on a single event loop"""
+    await asyncio.gather(*examples)
+
+
 def main():
     """Run all examples"""
     print("\n" + "="*60)
@@ -252,12 +259,15 @@ def main():
     # Note: Some examples require actual files and API keys
     # Uncomment the ones you want to run
     
-    # asyncio.run(example_1_simple_workflow())
-    # asyncio.run(example_2_with_llm_analyzer())
-    asyncio.run(example_3_simple_rule_based())
-    # asyncio.run(example_4_individual_agents())
-    asyncio.run(example_5_error_handling())
-    # asyncio.run(example_6_full_workflow())
+    # Independent examples share one event loop and run concurrently
+    asyncio.run(run_examples(
+        # example_1_simple_workflow(),
+        # example_2_with_llm_analyzer(),
+        example_3_simple_rule_based(),
+        # example_4_individual_agents(),
+        example_5_error_handling(),
+        # example_6_full_workflow(),
+    ))
     
     print("\n" + "="*60)
     print("✅ Examples completed!")
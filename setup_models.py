@@ -3,86 +3,404 @@ Setup script: Download all model weights automatically
 Run this to setup local models for the first time
 """
 
+import hashlib
+import mmap
 import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
 from pathlib import Path
 import requests
+from requests.adapters import HTTPAdapter
 from tqdm import tqdm
 from loguru import logger
+from urllib3.util.retry import Retry
+
+try:
+    import xxhash
+except ImportError:
+    xxhash = None
 
 
 # Model configurations
+# sha256: pinned digest of the release file. None = not pinned yet: downloads log
+# the digest they got (copy it here to enforce it) and verify falls back to size
 MODELS = {
     "nafnet_gopro": {
         "url": "https://github.com/megvii-research/NAFNet/releases/download/v1.0.0/NAFNet-GoPro-width32.pth",
         "filename": "NAFNet-GoPro-width32.pth",
         "size_mb": 16,
-        "required": True
+        "required": True,
+        "sha256": None
     },
     "gfpgan": {
         "url": "https://github.com/TencentARC/GFPGAN/releases/download/v1.3.0/GFPGANv1.3.pth",
         "filename": "GFPGANv1.3.pth",
         "size_mb": 348,
-        "required": True
+        "required": True,
+        "sha256": None
     },
     "codeformer": {
         "url": "https://github.com/sczhou/CodeFormer/releases/download/v0.1.0/codeformer.pth",
         "filename": "codeformer.pth",
         "size_mb": 376,
-        "required": False
+        "required": False,
+        "sha256": None
     },
     "lama": {
         "url": "https://huggingface.co/smartywu/big-lama/resolve/main/big-lama.pt?download=true",
         "filename": "big-lama.pt",
         "size_mb": 200,
-        "required": True
+        "required": True,
+        "sha256": None
     }
 }
 
+# Streaming chunk size: 256 KiB keeps loop/write overhead low for 100MB+ files
+DOWNLOAD_CHUNK_SIZE = 256 * 1024
+
+# Progress bar is advanced every 4 MiB rather than on every chunk
+PROGRESS_UPDATE_BYTES = 4 * 1024 * 1024
+
+# Large files are fetched as parallel byte ranges when the server allows it
+SHARD_COUNT = 4
+SHARD_MIN_SIZE = 64 * 1024 * 1024
+
+# (connect, read) timeout in seconds; read applies per chunk, not per file
+DOWNLOAD_TIMEOUT = (5, 60)
 
-def download_file(url: str, output_path: Path, description: str = "Downloading"):
+
+def create_session(pool_size: int = 4) -> requests.Session:
+    """
+    HTTP session shared by all downloads
+    
+    Keeps connections alive across files and retries transient failures
+    (connection errors, 429/5xx) with exponential backoff.
+    """
+    retry = Retry(
+        total=5,
+        backoff_factor=0.5,
+        status_forcelist=[429, 500, 502, 503, 504],
+        allowed_methods=["HEAD", "GET"]
+    )
+    adapter = HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size, max_retries=retry)
+    
+    session = requests.Session()
+    session.mount("https://", adapter)
+    session.mount("http://", adapter)
+    return session
+
+
+def preallocate(fd: int, offset: int, total_size: int):
+    """
+    Reserve disk space for the rest of a download up front
+    
+    One contiguous allocation instead of growing the file chunk by chunk;
+    also hints sequential access to the page cache. No-op where the
+    platform or filesystem doesn't support it.
+    """
+    if total_size <= offset:
+        return
+    
+    if hasattr(os, 'posix_fallocate'):
+        try:
+            os.posix_fallocate(fd, offset, total_size - offset)
+        except OSError:
+            pass
+    
+    if hasattr(os, 'posix_fadvise'):
+        os.posix_fadvise(fd, offset, total_size - offset, os.POSIX_FADV_SEQUENTIAL)
+
+
+def hash_file_into(h, filepath: Path):
+    """Feed a whole file into hash object `h` via mmap (no per-block copies)"""
+    with open(filepath, 'rb') as f:
+        if os.fstat(f.fileno()).st_size == 0:
+            return h
+        with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+            if hasattr(mm, "madvise") and hasattr(mmap, "MADV_SEQUENTIAL"):
+                mm.madvise(mmap.MADV_SEQUENTIAL)
+            h.update(mm)
+    return h
+
+
+def file_sha256(filepath: Path) -> str:
+    """SHA-256 of an existing file"""
+    return hash_file_into(hashlib.sha256(), filepath).hexdigest()
+
+
+# ==================== Fast local re-verification ====================
+# After a file has passed its full check once, a `<file>.xxh3` sidecar records
+# its xxh3 digest, size and mtime. `--fast-check` trusts an unchanged file
+# outright and re-hashes a changed one with xxh3 (~10x faster than SHA-256).
+FAST_HASH_SUFFIX = '.xxh3'
+
+
+def file_xxh3(filepath: Path) -> str:
+    """xxh3-64 of an existing file"""
+    return hash_file_into(xxhash.xxh3_64(), filepath).hexdigest()
+
+
+def write_fast_hash(filepath: Path, digest: str = None):
+    """Record the file's xxh3 digest, size and mtime in its sidecar"""
+    if xxhash is None:
+        return
+    
+    digest = digest or file_xxh3(filepath)
+    stat = filepath.stat()
+    sidecar = filepath.with_name(filepath.name + FAST_HASH_SUFFIX)
+    sidecar.write_text(f"{digest} {stat.st_size} {stat.st_mtime_ns}\n")
+
+
+def check_fast_hash(filepath: Path):
+    """
+    Verify a file against its sidecar
+    
+    Returns:
+        True/False, or None if there is no sidecar (or xxhash is missing)
+    """
+    sidecar = filepath.with_name(filepath.name + FAST_HASH_SUFFIX)
+    if xxhash is None or not sidecar.exists():
+        return None
+    
+    digest, size, mtime_ns = sidecar.read_text().split()
+    stat = filepath.stat()
+    
+    if stat.st_size != int(size):
+        return False
+    if stat.st_mtime_ns == int(mtime_ns):
+        return True
+    
+    # Touched since last check: re-hash, and refresh the sidecar if unchanged
+    if file_xxh3(filepath) != digest:
+        return False
+    write_fast_hash(filepath, digest)
+    return True
+
+
+def finish_download(part_path: Path, output_path: Path, digest: str, sha256: str = None) -> bool:
+    """
+    Check a completed .part against the pinned digest and move it into place
+    
+    Unpinned models log their digest so it can be added to MODELS.
+    """
+    if sha256 is None:
+        logger.warning(f"No sha256 pinned for {output_path.name}; downloaded file has sha256 {digest}")
+    elif digest != sha256:
+        part_path.unlink()
+        logger.error(f"❌ Checksum mismatch: {output_path.name}")
+        logger.error(f"   Expected: {sha256}, Got: {digest}")
+        return False
+    
+    os.replace(part_path, output_path)
+    write_fast_hash(output_path)
+    return True
+
+
+def download_file(
+    session: requests.Session,
+    url: str,
+    output_path: Path,
+    description: str = "Downloading",
+    position: int = 0,
+    sha256: str = None
+):
     """
     Download file with progress bar
     
+    The SHA-256 digest is computed while streaming, so checking it costs
+    no second pass over the file. Data lands in `<name>.part` and is moved
+    into place on success; a later call resumes from it with a Range request.
+    
     Args:
+        session: Shared HTTP session (see create_session)
         url: Download URL
         output_path: Where to save file
         description: Description for progress bar
+        position: Progress bar line (one per concurrent download)
+        sha256: Expected hex digest (None = skip integrity check)
     """
+    # Stream into a .part file so an interrupted download can be resumed
+    part_path = output_path.with_suffix(output_path.suffix + '.part')
+    
     try:
+        resume_from = part_path.stat().st_size if part_path.exists() else 0
+        headers = {'Range': f'bytes={resume_from}-'} if resume_from else {}
+        
         # Send request
-        response = requests.get(url, stream=True)
+        response = session.get(url, stream=True, headers=headers, timeout=DOWNLOAD_TIMEOUT)
+        
+        if response.status_code == 416:
+            # Stale .part (e.g. upstream file changed): start over
+            response.close()
+            part_path.unlink()
+            return download_file(session, url, output_path, description, position, sha256)
+        
         response.raise_for_status()
         
+        # Server may ignore Range and send the whole file (200)
+        if response.status_code != 206:
+            resume_from = 0
+        
         # Get total size
         total_size = int(response.headers.get('content-length', 0))
+        if total_size:
+            total_size += resume_from
+        
+        # Digest covers the bytes already on disk as well
+        h = hashlib.sha256()
+        if resume_from:
+            hash_file_into(h, part_path)
+            logger.info(f"↻ Resuming {output_path.name} from {resume_from / (1024 * 1024):.1f}MB")
         
         # Download with progress bar
-        with open(output_path, 'wb') as f:
-            with tqdm(
-                total=total_size,
-                unit='B',
-                unit_scale=True,
-                desc=description,
-                ncols=100
-            ) as pbar:
-                for chunk in response.iter_content(chunk_size=8192):
-                    if chunk:
-                        f.write(chunk)
-                        pbar.update(len(chunk))
+        with open(part_path, 'r+b' if resume_from else 'wb') as f:
+            f.seek(resume_from)
+            preallocate(f.fileno(), resume_from, total_size)
+            
+            try:
+                with tqdm(
+                    total=total_size,
+                    initial=resume_from,
+                    unit='B',
+                    unit_scale=True,
+                    desc=description,
+                    ncols=100,
+                    position=position
+                ) as pbar:
+                    pending_bytes = 0
+                    for chunk in response.iter_content(chunk_size=DOWNLOAD_CHUNK_SIZE):
+                        if chunk:
+                            f.write(chunk)
+                            h.update(chunk)
+                            pending_bytes += len(chunk)
+                            if pending_bytes >= PROGRESS_UPDATE_BYTES:
+                                pbar.update(pending_bytes)
+                                pending_bytes = 0
+                    pbar.update(pending_bytes)
+            finally:
+                # Drop unused preallocated space so a resume starts at the real end
+                f.truncate()
+        
+        if not finish_download(part_path, output_path, h.hexdigest(), sha256):
+            return False
         
         logger.info(f"✅ Downloaded: {output_path.name}")
         return True
         
     except Exception as e:
         logger.error(f"❌ Download failed: {e}")
+        if part_path.exists():
+            logger.info(f"Partial data kept in {part_path.name}; rerun to resume")
+        return False
+
+
+def download_file_sharded(
+    session: requests.Session,
+    url: str,
+    output_path: Path,
+    description: str = "Downloading",
+    position: int = 0,
+    sha256: str = None,
+    shards: int = SHARD_COUNT
+):
+    """
+    Download a large file as `shards` concurrent byte ranges
+    
+    Each range is written in place with os.pwrite into a preallocated
+    `.part` file; SHA-256 is checked over the finished file. Falls back to
+    download_file (single stream, resumable) when the server doesn't
+    support ranges, the file is small, or a partial download exists.
+    """
+    part_path = output_path.with_suffix(output_path.suffix + '.part')
+    
+    # os.pwrite is POSIX-only
+    if part_path.exists() or not hasattr(os, 'pwrite'):
+        return download_file(session, url, output_path, description, position, sha256)
+    
+    try:
+        # Resolve redirects (GitHub/HF -> CDN) once and learn the size
+        head = session.head(url, allow_redirects=True, timeout=DOWNLOAD_TIMEOUT)
+        head.raise_for_status()
+        total_size = int(head.headers.get('content-length', 0))
+        accepts_ranges = head.headers.get('accept-ranges', '').lower() == 'bytes'
+        url = head.url
+    except Exception as e:
+        logger.warning(f"HEAD failed for {output_path.name} ({e}), using a single stream")
+        return download_file(session, url, output_path, description, position, sha256)
+    
+    if not accepts_ranges or total_size < SHARD_MIN_SIZE:
+        return download_file(session, url, output_path, description, position, sha256)
+    
+    shard_size = -(-total_size // shards)
+    ranges = [
+        (start, min(start + shard_size, total_size) - 1)
+        for start in range(0, total_size, shard_size)
+    ]
+    progress_lock = threading.Lock()
+    
+    try:
+        with open(part_path, 'wb') as f, tqdm(
+            total=total_size,
+            unit='B',
+            unit_scale=True,
+            desc=description,
+            ncols=100,
+            position=position
+        ) as pbar:
+            fd = f.fileno()
+            preallocate(fd, 0, total_size)
+            f.truncate(total_size)
+            
+            def fetch_range(start: int, end: int):
+                headers = {'Range': f'bytes={start}-{end}'}
+                with session.get(url, stream=True, headers=headers, timeout=DOWNLOAD_TIMEOUT) as response:
+                    response.raise_for_status()
+                    if response.status_code != 206:
+                        raise IOError(f"Range request ignored (HTTP {response.status_code})")
+                    
+                    offset = start
+                    pending_bytes = 0
+                    for chunk in response.iter_content(chunk_size=DOWNLOAD_CHUNK_SIZE):
+                        if chunk:
+                            os.pwrite(fd, chunk, offset)
+                            offset += len(chunk)
+                            pending_bytes += len(chunk)
+                            if pending_bytes >= PROGRESS_UPDATE_BYTES:
+                                with progress_lock:
+                                    pbar.update(pending_bytes)
+                                pending_bytes = 0
+                    with progress_lock:
+                        pbar.update(pending_bytes)
+                
+                if offset != end + 1:
+                    raise IOError(f"Range {start}-{end} ended early at byte {offset}")
+            
+            with ThreadPoolExecutor(max_workers=len(ranges)) as executor:
+                for future in [executor.submit(fetch_range, *r) for r in ranges]:
+                    future.result()
+        
+        if not finish_download(part_path, output_path, file_sha256(part_path), sha256):
+            return False
+        
+        logger.info(f"✅ Downloaded: {output_path.name} ({len(ranges)} ranges)")
+        return True
+        
+    except Exception as e:
+        # A sharded .part has holes, so it can't be resumed: discard it
+        logger.error(f"❌ Download failed: {e}")
+        part_path.unlink(missing_ok=True)
         return False
 
 
 def check_existing(filepath: Path) -> bool:
     """Check if model already exists"""
     if filepath.exists():
-        size_mb = filepath.stat().st_size / (1024 * 1024)
-        logger.info(f"✓ Found existing: {filepath.name} ({size_mb:.1f}MB)")
+        # Lazy: the extra stat() only happens if INFO is actually emitted
+        logger.opt(lazy=True).info(
+            "✓ Found existing: {} ({:.1f}MB)",
+            lambda: filepath.name,
+            lambda: filepath.stat().st_size / (1024 * 1024)
+        )
         return True
     return False
 
@@ -117,10 +435,11 @@ def setup_models(models_dir: Path = None, download_optional: bool = False):
     logger.info(f"📦 Total download size: ~{total_size}MB")
     logger.info("")
     
-    # Download each model
+    # Collect models to download
     downloaded = 0
     skipped = 0
     failed = 0
+    pending = []
     
     for model_name, config in MODELS.items():
         # Skip optional models if not requested
@@ -136,19 +455,31 @@ def setup_models(models_dir: Path = None, download_optional: bool = False):
             skipped += 1
             continue
         
-        # Download
         logger.info(f"📥 Downloading {model_name} ({config['size_mb']}MB)...")
-        
-        success = download_file(
-            url=config['url'],
-            output_path=output_path,
-            description=f"Downloading {config['filename']}"
-        )
-        
-        if success:
-            downloaded += 1
-        else:
-            failed += 1
+        pending.append((config, output_path))
+    
+    # Downloads are network-bound and independent: run them concurrently
+    if pending:
+        with create_session(pool_size=len(pending) * SHARD_COUNT) as session, \
+                ThreadPoolExecutor(max_workers=len(pending)) as executor:
+            futures = [
+                executor.submit(
+                    download_file_sharded,
+                    session,
+                    url=config['url'],
+                    output_path=output_path,
+                    description=f"Downloading {config['filename']}",
+                    position=position,
+                    sha256=config['sha256']
+                )
+                for position, (config, output_path) in enumerate(pending)
+            ]
+            
+            for future in futures:
+                if future.result():
+                    downloaded += 1
+                else:
+                    failed += 1
         
         logger.info("")
     
@@ -173,9 +504,55 @@ def setup_models(models_dir: Path = None, download_optional: bool = False):
         logger.info("Please check your internet connection and try again")
 
 
-def verify_models(models_dir: Path = None):
+def verify_one(filepath: Path, config: dict, fast_check: bool = False) -> bool:
+    """Check a single model file; returns False if missing or corrupt"""
+    if not filepath.exists():
+        logger.error(f"❌ Missing: {config['filename']}")
+        return False
+    
+    if fast_check:
+        ok = check_fast_hash(filepath)
+        if ok is not None:
+            if ok:
+                logger.info(f"✅ OK: {config['filename']} (xxh3 fast check)")
+            else:
+                logger.error(f"❌ Changed since last verification: {config['filename']}")
+            return ok
+    
+    if config['sha256']:
+        # Pinned digest known: hash check supersedes the size heuristic
+        if file_sha256(filepath) != config['sha256']:
+            logger.error(f"❌ Checksum mismatch: {config['filename']}")
+            return False
+        logger.info(f"✅ OK: {config['filename']} (sha256 verified)")
+        if fast_check:
+            write_fast_hash(filepath)
+        return True
+    
+    size_mb = filepath.stat().st_size / (1024 * 1024)
+    expected_size = config['size_mb']
+    
+    # Check if size matches (allow 10% variance)
+    if abs(size_mb - expected_size) / expected_size > 0.1:
+        logger.warning(f"⚠️  Size mismatch: {config['filename']}")
+        logger.warning(f"   Expected: ~{expected_size}MB, Got: {size_mb:.1f}MB")
+    else:
+        logger.info(f"✅ OK: {config['filename']} ({size_mb:.1f}MB)")
+        if fast_check:
+            write_fast_hash(filepath)
+    return True
+
+
+def verify_models(models_dir: Path = None, fast_check: bool = False):
     """
     Verify all downloaded models
+    
+    Files are checked on a thread pool: hashlib releases the GIL while
+    hashing, so large files are verified in parallel.
+    
+    Args:
+        models_dir: Directory holding the models
+        fast_check: Use xxh3 sidecars from earlier full checks when present
     """
     if models_dir is None:
         project_root = Path(__file__).parent
@@ -184,27 +561,15 @@ def verify_models(models_dir: Path = None):
     logger.info("🔍 Verifying models...")
     logger.info("")
     
-    all_ok = True
+    required = [config for config in MODELS.values() if config['required']]
     
-    for model_name, config in MODELS.items():
-        if not config['required']:
-            continue
-        
-        filepath = models_dir / config['filename']
-        
-        if not filepath.exists():
-            logger.error(f"❌ Missing: {config['filename']}")
-            all_ok = False
-        else:
-            size_mb = filepath.stat().st_size / (1024 * 1024)
-            expected_size = config['size_mb']
-            
-            # Check if size matches (allow 10% variance)
-            if abs(size_mb - expected_size) / expected_size > 0.1:
-                logger.warning(f"⚠️  Size mismatch: {config['filename']}")
-                logger.warning(f"   Expected: ~{expected_size}MB, Got: {size_mb:.1f}MB")
-            else:
-                logger.info(f"✅ OK: {config['filename']} ({size_mb:.1f}MB)")
+    with ThreadPoolExecutor(max_workers=min(4, len(required))) as executor:
+        results = list(executor.map(
+            lambda config: verify_one(models_dir / config['filename'], config, fast_check),
+            required
+        ))
+    
+    all_ok = all(results)
     
     logger.info("")
     
@@ -216,38 +581,42 @@ def verify_models(models_dir: Path = None):
     return all_ok
 
 
-def clean_models(models_dir: Path = None):
+def clean_models(models_dir: Path = None, assume_yes: bool = False):
     """
     Remove all downloaded models
+    
+    Args:
+        models_dir: Directory holding the models
+        assume_yes: Skip the confirmation prompt (for scripts/CI)
     """
     if models_dir is None:
         project_root = Path(__file__).parent
         models_dir = project_root / "models"
     
     logger.warning("🗑️  This will delete all downloaded models!")
-    confirm = input("Are you sure? (y/N): ")
     
-    if confirm.lower() != 'y':
-        logger.info("Cancelled")
-        return
+    if not assume_yes:
+        confirm = input("Are you sure? (y/N): ")
+        
+        if confirm.lower() != 'y':
+            logger.info("Cancelled")
+            return
     
     if not models_dir.exists():
         logger.info("Models directory doesn't exist")
         return
     
-    # Delete all model files
-    deleted = 0
-    for model_file in models_dir.glob("*.pth"):
-        model_file.unlink()
-        logger.info(f"Deleted: {model_file.name}")
-        deleted += 1
+    # Delete model files, unfinished .part downloads and .xxh3 sidecars in one pass
+    deleted = []
+    with os.scandir(models_dir) as entries:
+        for entry in entries:
+            if entry.is_file() and entry.name.endswith(('.pth', '.pt', '.part', FAST_HASH_SUFFIX)):
+                os.unlink(entry.path)
+                deleted.append(entry.name)
     
-    for model_file in models_dir.glob("*.pt"):
-        model_file.unlink()
-        logger.info(f"Deleted: {model_file.name}")
-        deleted += 1
-    
-    logger.info(f"✅ Deleted {deleted} model files")
+    if deleted:
+        logger.info("Deleted:\n" + "\n".join(f"  {name}" for name in sorted(deleted)))
+    logger.info(f"✅ Deleted {len(deleted)} model files")
 
 
 if __name__ == "__main__":
@@ -264,6 +633,11 @@ if __name__ == "__main__":
         action="store_true",
         help="Verify downloaded models"
     )
+    parser.add_argument(
+        "--fast-check",
+        action="store_true",
+        help="With --verify: reuse xxh3 sidecars instead of full checks (needs xxhash)"
+    )
     parser.add_argument(
         "--clean",
         action="store_true",
@@ -274,12 +648,17 @@ if __name__ == "__main__":
         type=Path,
         help="Custom models directory"
     )
+    parser.add_argument(
+        "--yes", "-y",
+        action="store_true",
+        help="Don't ask for confirmation (with --clean)"
+    )
     
     args = parser.parse_args()
     
     if args.clean:
-        clean_models(args.models_dir)
+        clean_models(args.models_dir, assume_yes=args.yes)
     elif args.verify:
-        verify_models(args.models_dir)
+        verify_models(args.models_dir, fast_check=args.fast_check)
     else:
         setup_models(args.models_dir, args.download_optional)